@@ -1,10 +1,42 @@
 """Docsumo class to upload document and get extracted data"""
+import collections
+import concurrent.futures
+import contextlib
+import functools
 import os
-
-import requests
-
-from .error import NoAPIKey, UnsupportedDocumentType, LengthNotMatched
+import random
+import threading
+import time
+
+from .error import (
+    NoAPIKey,
+    UnsupportedDocumentType,
+    LengthNotMatched,
+    PreflightError,
+    CreditLimitExceeded,
+    DeadlineExceeded,
+)
+from .cache import StaleWhileRevalidate
+from .concurrency import AdaptiveLimiter
 from .config import allowed_file_types
+from .instrumentation import Instrumentation
+from .multipart import MultipartStream
+from .preflight import CreditTracker, check_bytes, check_file
+from .projection import Projection
+from .singleflight import SingleFlight
+from .transport import RequestsTransport
+
+# reads with fewer latency samples are not hedged
+hedge_min_samples = 20
+hedge_workers = 32
+# bulk requests throttled with a 429 or 503 are sent again up to this many
+# times, waiting ``throttle_backoff`` seconds at first and twice as long
+# after every retry
+throttle_retries = 5
+throttle_backoff = 0.5
+# used up credits are synced with the server again at most this often, to
+# pick up monthly resets, raised limits and uploads that were not charged
+credits_sync = 60
 
 
 class Docsumo:
@@ -18,11 +50,55 @@ class Docsumo:
             Url of docsumo api
         version:``str``
             API version.
+        instrumentation:``Instrumentation``
+            Request hooks and metrics. Pass ``True`` for built-in metrics only,
+            ``False`` for none, which rules out ``hedge`` and ``concurrency``.
+        transport:``Transport``
+            HTTP engine, defaults to a pooled ``RequestsTransport``.
+        optimizer:``Optimizer``
+            Shrinks images and PDFs before they are uploaded.
+        preflight:``bool``
+            Validate files, document types and remaining credits locally
+            before uploading, see ``preflight``.
+        coalesce:``bool``
+            Concurrent identical reads, like ``extracted_data`` of the same
+            document from several threads, share one request and its decoded
+            result. Callers must not modify the shared result.
+        timeout:``float``
+            Seconds each request may wait on the server, ``None`` waits
+            forever. See ``deadline`` for budgets spanning several requests.
+        hedge:``float``
+            Latency quantile, e.g. ``0.95``, past which a read is sent a second
+            time, the first response to arrive wins. Enables instrumentation,
+            whose latency histogram provides the quantile, and needs its
+            metrics.
+        concurrency:``AdaptiveLimiter``
+            Run bulk operations concurrently, with an in-flight limit adapted
+            to latency and throttling. Pass ``True`` for the defaults. Without
+            it uploads and deletions go one at a time.
+        cache_ttl:``float``
+            Seconds ``documents_summary`` and ``user_detail_credit_limit``
+            answers are reused. Older answers are still returned at once
+            while a background request refreshes them.
     Returns:
         Docsumo class object.            
     """
 
-    def __init__(self, apikey=None, url=None, version="v1"):
+    def __init__(
+        self,
+        apikey=None,
+        url=None,
+        version="v1",
+        instrumentation=None,
+        transport=None,
+        optimizer=None,
+        preflight=False,
+        coalesce=False,
+        timeout=120,
+        hedge=None,
+        concurrency=None,
+        cache_ttl=None,
+    ):
 
         if apikey:
             self.apikey = apikey
@@ -40,6 +116,301 @@ class Docsumo:
         self.headers = {"apikey": self.apikey}
         self.doc_titles = None
 
+        if instrumentation is False:
+            if hedge or concurrency:
+                raise ValueError("hedge and concurrency need instrumentation")
+            instrumentation = None
+        if instrumentation is True or (
+            (hedge or concurrency) and instrumentation is None
+        ):
+            instrumentation = Instrumentation()
+        if hedge and instrumentation.metrics is None:
+            # the hedging delay is a quantile of the latency histograms
+            raise ValueError("hedge needs instrumentation with metrics")
+        if concurrency is True:
+            concurrency = AdaptiveLimiter()
+        if concurrency is not None:
+            instrumentation.add_post_hook(concurrency.observe)
+        self.limiter = concurrency
+        self.instrumentation = instrumentation
+        self.transport = transport if transport is not None else RequestsTransport()
+        self.optimizer = optimizer
+        self.preflight_checks = preflight
+        self.credits = None
+        self.single_flight = SingleFlight() if coalesce else None
+        self.timeout = timeout
+        self.hedge = hedge
+        self._hedge_executor = None
+        self._hedge_lock = threading.Lock()
+        self._local = threading.local()
+        self.cache = None
+        if cache_ttl:
+            # error responses are neither cached nor replace a good value
+            self.cache = StaleWhileRevalidate(
+                cache_ttl, valid=lambda cached: cached[0].get("status") == "success"
+            )
+        self._uploads = 0
+        self._uploads_lock = threading.Lock()
+
+    @property
+    def metrics(self):
+        """Built-in ``Metrics`` of the client, ``None`` when instrumentation is off."""
+        if self.instrumentation is None:
+            return None
+        return self.instrumentation.metrics
+
+    def _expires(self, timeout):
+        """Monotonic time a ``timeout`` budget started now ends, within the current one."""
+        current = getattr(self._local, "expires", None)
+        if timeout is None:
+            return current
+        expires = time.monotonic() + timeout
+        return expires if current is None else min(current, expires)
+
+    @contextlib.contextmanager
+    def _until(self, expires):
+        previous = getattr(self._local, "expires", None)
+        self._local.expires = expires
+        try:
+            yield
+        finally:
+            self._local.expires = previous
+
+    def deadline(self, timeout):
+        """
+        Context manager giving every request made in the block, by the
+        current thread, a shared budget of ``timeout`` seconds. Nested
+        deadlines can only shorten it. Requests starting after it ran out
+        raise ``DeadlineExceeded``.
+
+        .. code-block:: python
+
+            with client.deadline(30):
+                for document in client.documents_iter():
+                    ...
+        """
+        return self._until(self._expires(timeout))
+
+    def _remaining(self):
+        expires = getattr(self._local, "expires", None)
+        if expires is None:
+            return None
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Deadline exceeded")
+        return remaining
+
+    def _uploaded(self):
+        """Count a successful upload against the cached credit limit."""
+        with self._uploads_lock:
+            self._uploads += 1
+        if self.credits is not None:
+            self.credits.settle()
+
+    def _sync_credits(self):
+        """Sync used up credits with the server, at most every ``credits_sync`` seconds."""
+        if self.credits is not None and self.credits.due(credits_sync):
+            self.credits.update(self.user_detail_credit_limit(fresh=True)["data"])
+
+    def _cached(self, name, fetch, fresh):
+        """
+        ``fetch()`` through the cache, along with the number of uploads made
+        before it was sent.
+        """
+        if self.cache is None:
+            return fetch(), self._uploads
+
+        def counted():
+            uploads = self._uploads
+            return fetch(), uploads
+
+        return self.cache.get(name, counted, fresh)
+
+    def _request(self, name, method, url, strict=True, **kwargs):
+        """
+        Send a request and decode its JSON body.
+
+        Args:
+            name:``str``
+                Client method issuing the request, used by instrumentation.
+            strict:``bool``
+                Raise when the body is not JSON, otherwise decode it as ``None``.
+        Returns:
+            ``(response, dict)``
+        """
+        remaining = self._remaining()
+        timeout = self.timeout
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        kwargs["timeout"] = timeout
+
+        if self.single_flight is not None and method == "GET":
+            params = sorted((kwargs.get("params") or {}).items())
+            result, merged = self.single_flight.do(
+                (url, repr(params)),
+                lambda: self._send(name, method, url, strict, **kwargs),
+                timeout=remaining,
+            )
+            if merged and self.metrics is not None:
+                self.metrics.incr(name, "coalesced")
+            return result
+        return self._send(name, method, url, strict, **kwargs)
+
+    def _send(self, name, method, url, strict=True, **kwargs):
+        send = lambda: self.transport.request(method, url, **kwargs)
+        if self.hedge and method == "GET":
+            request = send
+            send = lambda: self._hedged(name, request)
+
+        if self.instrumentation is not None:
+            return self.instrumentation.call(name, method, url, send, strict)
+
+        response = send()
+        try:
+            return response, response.json()
+        except ValueError:
+            if strict:
+                raise
+            return response, None
+
+    def _retrying(self, name, method, url, **kwargs):
+        """
+        ``_request`` sent again while the server throttles it with a 429 or
+        503, after ``Retry-After`` or an exponential backoff. Gives up with
+        the last response when the deadline would pass first.
+        """
+        attempt = 0
+        while True:
+            response, body = self._request(name, method, url, **kwargs)
+            if response.status_code not in (429, 503) or attempt == throttle_retries:
+                return response, body
+
+            try:
+                delay = float(response.headers.get("Retry-After"))
+            except (TypeError, ValueError):
+                # jitter spreads the retries of a throttled burst
+                delay = throttle_backoff * 2**attempt * random.uniform(0.5, 1.0)
+            remaining = self._remaining()
+            if remaining is not None and delay >= remaining:
+                return response, body
+            if self.metrics is not None:
+                self.metrics.incr(name, "retries")
+            time.sleep(delay)
+            for _, value in (kwargs.get("files") or {}).values():
+                if hasattr(value, "seek"):
+                    value.seek(0)
+            attempt += 1
+
+    def _hedged(self, name, send):
+        """
+        Run ``send()`` and, when it is slower than the ``hedge`` quantile of
+        earlier ``name`` requests, a second ``send()`` racing it.
+        """
+        histogram = self.metrics.latency.get(name)
+        delay = None
+        if histogram is not None and histogram.count >= hedge_min_samples:
+            delay = histogram.percentile(self.hedge)
+        if delay is None or delay == float("inf"):
+            return send()
+
+        with self._hedge_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=hedge_workers
+                )
+        first = self._hedge_executor.submit(send)
+        done, _ = concurrent.futures.wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        self.metrics.incr(name, "hedged")
+        second = self._hedge_executor.submit(send)
+        for attempt in concurrent.futures.as_completed([first, second]):
+            if attempt.exception() is None:
+                if attempt is second:
+                    self.metrics.incr(name, "hedge_won")
+                return attempt.result()
+        return first.result()
+
+    def _bulk(self, tasks, workers=1, expires=None):
+        """
+        Run callables concurrently, yielding their results in order.
+
+        The requests in flight are bounded by the client's adaptive limiter,
+        or by ``workers`` when it has none.
+
+        Args:
+            tasks:``iterable``
+                Callables, consumed lazily.
+            expires:
+                Deadline of the operation, see ``_expires``.
+        """
+        limiter = self.limiter
+        if limiter is None:
+            limiter = threading.BoundedSemaphore(workers)
+        else:
+            workers = limiter.max_limit
+        tasks = iter(tasks)
+        window = collections.deque()
+        exhausted = False
+
+        def run(task):
+            try:
+                with self._until(expires):
+                    return task()
+            finally:
+                limiter.release()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                while window and window[0].done():
+                    yield window.popleft().result()
+
+                # results are kept in order, so cap those waiting on a slow one
+                while (
+                    not exhausted
+                    and len(window) < workers * 2
+                    and limiter.acquire(blocking=not window)
+                ):
+                    try:
+                        task = next(tasks, None)
+                    except BaseException:
+                        limiter.release()
+                        raise
+                    if task is None:
+                        exhausted = True
+                        limiter.release()
+                    else:
+                        window.append(executor.submit(run, task))
+
+                if not window:
+                    return
+                concurrent.futures.wait(
+                    [f for f in window if not f.done()],
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+
+    def _file_part(self, file_path, optimized=None):
+        """
+        Multipart ``(filename, content)`` of a document, optimized when the
+        client has an optimizer.
+
+        Args:
+            file_path:``str``
+                Path of document.
+            optimized:``Future``
+                Pending ``Optimizer.submit`` result for the document.
+        """
+        if self.optimizer is None:
+            return os.path.basename(file_path), open(file_path, "rb")
+
+        if optimized is None:
+            optimized = self.optimizer.submit(file_path)
+        optimized = optimized.result()
+        if self.metrics is not None:
+            self.metrics.incr("upload", "bytes_saved", optimized.bytes_saved)
+        return optimized.filename, optimized.content
+
     @staticmethod
     def _validate_date(date):
         """validate date has format of YYYY-MM-DD"""
@@ -51,12 +422,21 @@ class Docsumo:
 
         raise Exception("format should be 'YYYY-MM-DD'")
 
-    def user_detail_credit_limit(self):
+    def user_detail_credit_limit(self, timeout=None, fresh=False):
         """
         Provides credit limit information for user.
         Provides the information on the number of documents
         that the user can upload and the number of documents the user has already uploaded.
 
+        Answers from the cache count the uploads made by this client since
+        they were fetched in ``monthly_doc_current``.
+
+        Args:
+            timeout:``float``
+                Seconds this call may take, see ``deadline``.
+            fresh:``bool``
+                Bypass the ``cache_ttl`` cache and wait for a new answer.
+
         Returns:
             Limit Information : ``dict``
 
@@ -80,10 +460,38 @@ class Docsumo:
         """
 
         url = "{}/api/{}/eevee/apikey/limit/".format(self.url, self.version)
-        response = requests.request("GET", url, headers=self.headers)
-        original_response = response.json()
+
+        def fetch():
+            with self.deadline(timeout):
+                _, original_response = self._request(
+                    "user_detail_credit_limit", "GET", url, headers=self.headers
+                )
+            return original_response
+
+        original_response, uploads = self._cached(
+            "user_detail_credit_limit", fetch, fresh
+        )
+        since = self._uploads - uploads
+        data = original_response.get("data")
+        if since and isinstance(data, dict) and "monthly_doc_current" in data:
+            data = dict(data, monthly_doc_current=data["monthly_doc_current"] + since)
+            original_response = dict(original_response, data=data)
         return original_response
 
+    def credits_remaining(self, fresh=False):
+        """
+        Documents that can still be uploaded this month, counting the uploads
+        made since the credit limit was last fetched.
+
+        Args:
+            fresh:``bool``
+                Bypass the ``cache_ttl`` cache and wait for a new answer.
+        Returns:
+            Remaining credits : ``int``
+        """
+        data = self.user_detail_credit_limit(fresh=fresh)["data"]
+        return max(data["monthly_doc_limit"] - data["monthly_doc_current"], 0)
+
     def documents_list(
         self,
         offset=0,
@@ -91,6 +499,7 @@ class Docsumo:
         status="",
         created_date_greater_than="",
         created_date_less_than="",
+        timeout=None,
     ):
         """
         Returns basic details of all the documents uploaded by the user.
@@ -107,6 +516,8 @@ class Docsumo:
                 format ``YYYY-MM-DD``
             created_date_less_than: ``str``
                 format ``YYYY-MM-DD`` 
+            timeout:``float``
+                Seconds this call may take, see ``deadline``.
 
         Returns:
             Document list with details : ``dict``
@@ -180,18 +591,66 @@ class Docsumo:
         if date:
             querystring.update({"created_date": date})
 
-        response = requests.request(
-            "GET", url, headers=self.headers, params=querystring
-        )
-        return response.json()
+        with self.deadline(timeout):
+            _, original_response = self._request(
+                "documents_list", "GET", url, headers=self.headers, params=querystring
+            )
+        return original_response
 
-    def extracted_data(self, doc_id):
+    def documents_iter(
+        self,
+        status="",
+        created_date_greater_than="",
+        created_date_less_than="",
+        page_size=100,
+        timeout=None,
+    ):
+        """
+        Iterates over all documents matching the filters, fetching
+        ``documents_list`` page by page.
+
+        Args:
+            status:``list``
+                Same as ``documents_list``.
+            created_date_greater_than: ``str``
+                format ``YYYY-MM-DD``
+            created_date_less_than: ``str``
+                format ``YYYY-MM-DD``
+            page_size:``int``
+                Number of documents requested per page.
+            timeout:``float``
+                Seconds all the pages may take, see ``deadline``.
+        Yields:
+            Document details : ``dict``
+        """
+        expires = self._expires(timeout)
+        offset = 0
+        while True:
+            with self._until(expires):
+                page = self.documents_list(
+                    offset=offset,
+                    limit=page_size,
+                    status=status,
+                    created_date_greater_than=created_date_greater_than,
+                    created_date_less_than=created_date_less_than,
+                )["data"]
+            documents = page["documents"]
+            for document in documents:
+                yield document
+
+            offset += len(documents)
+            if not documents or offset >= page.get("total", 0):
+                return
+
+    def extracted_data(self, doc_id, timeout=None):
         """
         Returns details of a document whose valid document id is provided in doc_id agrument.
 
         Args:
             doc_id:``str``
                 Valid Document Id of the document whose detail is required. 
+            timeout:``float``
+                Seconds this call may take, see ``deadline``.
 
         Returns:
             Document details : ``dict`` 
@@ -230,14 +689,71 @@ class Docsumo:
         """
 
         url = "{}/api/{}/eevee/apikey/data/{}/".format(self.url, self.version, doc_id)
-        response = requests.request("GET", url, headers=self.headers)
-        original_response = response.json()
+        with self.deadline(timeout):
+            _, original_response = self._request(
+                "extracted_data", "GET", url, headers=self.headers
+            )
         return original_response
 
-    def documents_summary(self):
+    def extracted_fields_iter(
+        self, doc_ids, fields, position=False, workers=8, timeout=None
+    ):
+        """
+        Fetches the extracted data of many documents concurrently, yielding
+        only the requested fields as one row per document, in order.
+
+        Args:
+            doc_ids:``list``
+                Document ids, any iterable works.
+            fields:``list``
+                Field paths such as ``invoice.number`` or
+                ``transactions[*].amount``, or a ``Projection``.
+            position:``bool``
+                Add a ``<path>.position`` column per field.
+            workers:``int``
+                Documents fetched at the same time, unless the client has an
+                adaptive ``concurrency`` limiter.
+            timeout:``float``
+                Seconds all the documents may take, see ``deadline``.
+        Yields:
+            Row : ``dict``
+
+            .. code-block:: json
+
+                {
+                    'doc_id': '16474639f3da47beb87788c875503009',
+                    'invoice.number': '19',
+                    'transactions[*].amount': ['120', '164']
+                }
+
+            Rows of documents whose data could not be fetched hold ``None``
+            values and an ``error``.
+        """
+        if not isinstance(fields, Projection):
+            fields = Projection(fields, position=position)
+
+        def fetch(doc_id):
+            response = self.extracted_data(doc_id)
+            row = {"doc_id": doc_id}
+            row.update(fields.row(response))
+            if isinstance(response, dict) and response.get("error"):
+                row["error"] = response["error"]
+            return row
+
+        tasks = (functools.partial(fetch, doc_id) for doc_id in doc_ids)
+        # the budget is carried over to the worker threads
+        return self._bulk(tasks, workers, self._expires(timeout))
+
+    def documents_summary(self, timeout=None, fresh=False):
         """
         Summary of all document status
 
+        Args:
+            timeout:``float``
+                Seconds this call may take, see ``deadline``.
+            fresh:``bool``
+                Bypass the ``cache_ttl`` cache and wait for a new answer.
+
         Returns:
             Limit Information : ``dict``
 
@@ -257,8 +773,15 @@ class Docsumo:
         """
 
         url = "{}/api/{}/eevee/apikey/documents/summary/".format(self.url, self.version)
-        response = requests.request("GET", url, headers=self.headers)
-        original_response = response.json()
+
+        def fetch():
+            with self.deadline(timeout):
+                _, original_response = self._request(
+                    "documents_summary", "GET", url, headers=self.headers
+                )
+            return original_response
+
+        original_response, _ = self._cached("documents_summary", fetch, fresh)
         return original_response
 
     def upload_file(self, file_path, doc_title, user_doc_id=None):
@@ -294,6 +817,12 @@ class Docsumo:
                     'status_code': 200
                 }
         """
+        if self.preflight_checks:
+            doc_type = self.preflight(file_path, doc_title)
+            return self._with_credit(
+                lambda: self._upload("upload_file", file_path, doc_type, user_doc_id)
+            )
+
         doc_type = doc_title
 
         if not self.doc_titles:
@@ -316,29 +845,181 @@ class Docsumo:
         else:
             doc_type = self.doc_titles[doc_type]
 
+        return self._upload("upload_file", file_path, doc_type, user_doc_id)
+
+    def _upload(self, name, file_path, doc_type, user_doc_id=None):
         url = "{}/api/{}/eevee/apikey/upload/".format(self.url, self.version)
         headers = {"apikey": self.apikey}
 
-        filename = os.path.basename(file_path)
-
+        filename, content = self._file_part(file_path)
         multipart_form_data = {
-            "files": (filename, open(file_path, "rb")),
+            "files": (filename, content),
             "type": (None, doc_type),
             "uploaded_from": (None, "api"),
         }
         if user_doc_id:
-            multipart_form_data["user_doc_id"]: (None, user_doc_id)
+            multipart_form_data["user_doc_id"] = (None, user_doc_id)
+
+        try:
+            _, original_response = self._request(
+                name, "POST", url, files=multipart_form_data, headers=headers
+            )
+        finally:
+            if hasattr(content, "close"):
+                content.close()
+        if original_response.get("status") == "success":
+            self._uploaded()
+        return original_response
 
-        response = requests.post(url, files=multipart_form_data, headers=headers)
-        original_response = response.json()
+    def _with_credit(self, upload):
+        """Run ``upload()`` holding one credit, given back when the upload is rejected."""
+        if self.credits is None:
+            return upload()
+
+        self._sync_credits()
+        self.credits.reserve()
+        try:
+            original_response = upload()
+        except Exception:
+            self.credits.release()
+            raise
+        if original_response.get("status") != "success":
+            self.credits.release()
         return original_response
 
-    def delete_documents(self, doc_ids):
+    def upload_bytes(self, content, filename, doc_title, user_doc_id=None):
+        """
+        Uploads a document held in memory, without a temporary file.
+        The content is streamed from the given buffer without being copied.
+
+        Args:
+            content:``bytes``
+                Document as ``bytes``, ``bytearray`` or ``memoryview``.
+            filename:``str``
+                File name of the document, its extension tells the file type.
+            doc_title:``str``
+                Document title. You can get title using ``user_detail_credit_limit``.
+            user_doc_id: ``str``
+                document id given by user
+        Returns:
+            Document upload details, same as ``upload_file`` : ``dict``
+        """
+        if self.preflight_checks:
+            check_bytes(content, filename)
+        return self._upload_stream(
+            "upload_bytes", content, filename, doc_title, user_doc_id
+        )
+
+    def upload_stream(self, stream, filename, doc_title, user_doc_id=None, length=None):
+        """
+        Uploads a document from a readable file object, e.g. an object
+        storage download or a pipe. Non seekable streams are sent with
+        chunked transfer encoding unless ``length`` is given.
+
+        Args:
+            stream:
+                Readable binary file object.
+            filename:``str``
+                File name of the document, its extension tells the file type.
+            doc_title:``str``
+                Document title. You can get title using ``user_detail_credit_limit``.
+            user_doc_id: ``str``
+                document id given by user
+            length:``int``
+                Number of bytes the stream will yield, if known.
+        Returns:
+            Document upload details, same as ``upload_file`` : ``dict``
+        """
+        return self._upload_stream(
+            "upload_stream", stream, filename, doc_title, user_doc_id, length
+        )
+
+    def _upload_stream(
+        self, name, content, filename, doc_title, user_doc_id=None, length=None
+    ):
+        doc_type = self._document_type(doc_title)
+        self._sync_credits()
+        if self.credits is not None and not self.credits.remaining:
+            raise CreditLimitExceeded(
+                "monthly document limit of {} reached".format(self.credits.limit)
+            )
+
+        fields = {"type": doc_type, "uploaded_from": "api"}
+        if user_doc_id:
+            fields["user_doc_id"] = user_doc_id
+        body = MultipartStream(fields, "files", filename, content, length)
+
+        url = "{}/api/{}/eevee/apikey/upload/".format(self.url, self.version)
+        headers = {"apikey": self.apikey, "Content-Type": body.content_type}
+
+        def upload():
+            _, original_response = self._request(
+                name, "POST", url, data=body, headers=headers
+            )
+            if original_response.get("status") == "success":
+                self._uploaded()
+            return original_response
+
+        return self._with_credit(upload)
+
+    def _document_type(self, doc_title):
+        """
+        Document type value of a title or value, checked against the types
+        cached from ``user_detail_credit_limit``.
+        """
+        if not self.doc_titles or (self.preflight_checks and self.credits is None):
+            user_detail = self.user_detail_credit_limit()["data"]
+            doc_titles = user_detail.get("document_types", None)
+            if doc_titles:
+                self.doc_titles = {i["title"]: i["value"] for i in doc_titles}
+            if self.preflight_checks:
+                self.credits = CreditTracker.from_user_detail(user_detail)
+
+        doc_titles = self.doc_titles or {}
+        if doc_title in doc_titles:
+            return doc_titles[doc_title]
+        if doc_title.lower() in doc_titles.values():
+            return doc_title.lower()
+        raise UnsupportedDocumentType(
+            "{} document type is not supported. Supported types: {}".format(
+                doc_title, list(doc_titles.values())
+            )
+        )
+
+    def preflight(self, file_path, doc_title):
+        """
+        Validates a document locally so doomed uploads fail before any byte
+        is sent: extension and magic bytes must match a supported format,
+        the file must be complete, the document type must be known and
+        credits must be left.
+
+        Args:
+            file_path:``str``
+                Path of document to be uploaded.
+            doc_title:``str``
+                Document title or type.
+        Returns:
+            Document type : ``str``
+        Raises:
+            ``PreflightError``, ``UnsupportedDocumentType`` or ``CreditLimitExceeded``
+        """
+        check_file(file_path)
+        doc_type = self._document_type(doc_title)
+        self._sync_credits()
+        if self.credits is not None and not self.credits.remaining:
+            raise CreditLimitExceeded(
+                "monthly document limit of {} reached".format(self.credits.limit)
+            )
+        return doc_type
+
+    def delete_documents(self, doc_ids, timeout=None):
         """
         delete document
         Args:
             doc_ids:``list``
                 list of doc_ids 
+            timeout:``float``
+                Seconds all the deletions may take, see ``deadline``.
         Returns: 
             Doc_ids Detail: `json`
                 .. code-block:: json
@@ -348,19 +1029,46 @@ class Docsumo:
                         'not_deleted_doc': [{'doc_id': 'ghsd',
                                             'err_message': 'files doesnt exist'}, ..]
                     }
+
+            Throttled deletions are retried, those still failing are listed
+            in ``not_deleted_doc``.
         """
 
         if isinstance(doc_ids, list):
             if doc_ids:
-                for doc_id in doc_ids:
-                    url = "{}/api/{}/eevee/apikey/delete/{}/".format(
-                        self.url, self.version, doc_id
-                    )
-                    response = requests.request(
-                        "POST", url, headers={"apikey": self.apikey}
-                    )
-                    _ = response.json()
-                return {"deleted_doc": doc_ids, "not_deleted_doc": []}
+                url = "{}/api/{}/eevee/apikey/delete/{}/"
+
+                def delete(doc_id):
+                    try:
+                        response, body = self._retrying(
+                            "delete_documents",
+                            "POST",
+                            url.format(self.url, self.version, doc_id),
+                            strict=False,
+                            headers={"apikey": self.apikey},
+                        )
+                    except Exception as e:
+                        return doc_id, "{}: {}".format(type(e).__name__, e)
+                    if not isinstance(body, dict):
+                        body = {}
+                    if (
+                        response.status_code >= 400
+                        or body.get("status", "success") != "success"
+                    ):
+                        message = body.get("message") or body.get("error")
+                        return doc_id, message or "HTTP {}".format(response.status_code)
+                    return doc_id, None
+
+                tasks = [functools.partial(delete, doc_id) for doc_id in doc_ids]
+                result = {"deleted_doc": [], "not_deleted_doc": []}
+                for doc_id, error in self._bulk(tasks, expires=self._expires(timeout)):
+                    if error is None:
+                        result["deleted_doc"].append(doc_id)
+                    else:
+                        result["not_deleted_doc"].append(
+                            {"doc_id": doc_id, "err_message": error}
+                        )
+                return result
             else:
                 raise ValueError("doc_ids should have have atleast one doc_id")
         else:
@@ -379,24 +1087,34 @@ class Docsumo:
                 url = "{}/api/{}/eevee/apikey/delete/{}/".format(
                     self.url, self.version, doc_id
                 )
-                _ = requests.request("POST", url, headers={"apikey": self.apikey})
+                _ = self._request(
+                    "delete_documents_all",
+                    "POST",
+                    url,
+                    strict=False,
+                    headers={"apikey": self.apikey},
+                )
             return doc_ids
         else:
             return []
 
-    def extracted_ocr(self, doc_id):
+    def extracted_ocr(self, doc_id, timeout=None):
         """
         Returns ocr detail for document
         Args:
             doc_id:``str``
                 Valid Document Id of the document whose detail is required. 
+            timeout:``float``
+                Seconds this call may take, see ``deadline``.
         Returns:
             Document ocr details : ``dict`` 
         """
 
         url = "{}/api/{}/eevee/apikey/ocr/{}/".format(self.url, self.version, doc_id)
-        response = requests.request("GET", url, headers=self.headers)
-        original_response = response.json()
+        with self.deadline(timeout):
+            _, original_response = self._request(
+                "extracted_ocr", "GET", url, headers=self.headers
+            )
         return original_response
 
     def _update_item(self, doc_id, item_id, value, position):
@@ -418,8 +1136,9 @@ class Docsumo:
         url = "{}/api/{}/eevee/apikey/update/item/{}/{}/".format(
             self.url, self.version, doc_id, item_id
         )
-        response = requests.request("POST", url, headers=self.headers, json=data)
-        original_response = response.json()
+        _, original_response = self._request(
+            "_update_item", "POST", url, headers=self.headers, json=data
+        )
         return original_response
 
     def _add_item(self, doc_id, item_dict):
@@ -465,11 +1184,12 @@ class Docsumo:
         url = "{}/api/{}/eevee/apikey/add/item/{}/".format(
             self.url, self.version, doc_id
         )
-        response = requests.request("POST", url, headers=self.headers, json=data)
-        original_response = response.json()
+        _, original_response = self._request(
+            "_add_item", "POST", url, headers=self.headers, json=data
+        )
         return original_response
 
-    def upload_files(self, file_paths, doc_title, user_doc_ids=None):
+    def upload_files(self, file_paths, doc_title, user_doc_ids=None, timeout=None):
         """
         Uploads valid document lists for processing.
 
@@ -480,6 +1200,8 @@ class Docsumo:
                 Document type. Currently supported: (Invoice, Invoice_drip, bank_statements)`` 
             user_doc_ids: ``list``
                 List of Document Id to be uploaded. Optional
+            timeout:``float``
+                Seconds all the uploads may take, see ``deadline``.
         Returns:
             Document upload details for successful uploads : ``dict``                          
         
@@ -526,67 +1248,221 @@ class Docsumo:
                                             }
                                         ]}
         """
+        correct_response = []
+        error_response = []
+
+        for result in self.upload_files_iter(
+            file_paths, doc_title, user_doc_ids, timeout=timeout
+        ):
+            if result["uploaded"]:
+                correct_response.append(result["response"])
+            else:
+                error_response.append(result["response"])
+
+        final_response = {
+            "files_uploaded": correct_response,
+            "files_not_uploaded": error_response,
+        }
+
+        return final_response
+
+    def upload_files_iter(
+        self, file_paths, doc_title, user_doc_ids=None, prefetch=8, timeout=None
+    ):
+        """
+        Uploads valid document lists for processing, yielding the outcome of
+        each file as soon as it is known instead of collecting them.
+
+        Args:
+            file_paths:``list``
+                List of document paths to be uploaded, any iterable works
+                when ``user_doc_ids`` is not given.
+            doc_title:``str``
+                Document type. Currently supported: (Invoice, Invoice_drip, bank_statements)``
+            user_doc_ids: ``list``
+                List of Document Id to be uploaded. Optional
+            prefetch:``int``
+                Files optimized ahead of the upload when the client has an
+                optimizer.
+            timeout:``float``
+                Seconds all the uploads may take, see ``deadline``.
+        Yields:
+            Upload outcome : ``dict``
+
+            .. code-block:: json
+
+                {
+                    'file_path': './invoice_1.png',
+                    'uploaded': False,
+                    'response': {
+                        'metadata': {'user_doc_id': '7', 'title': 'invoice_1.png'},
+                        'error': 'Duplicated user_id ',
+                        'message': '',
+                        'status': 'fail',
+                        'status_code': 409
+                    }
+                }
+
+            ``response`` is the upload response for uploaded files and an
+            entry like those of ``files_not_uploaded`` otherwise, also when
+            the upload of a file raised, e.g. on a timeout.
+        """
         doc_type = doc_title
         doc_type = doc_type.lower()
 
         url = "{}/api/{}/eevee/apikey/upload/".format(self.url, self.version)
         headers = {"apikey": self.apikey}
 
-        correct_response = []
-        error_response = []
         error_codes = [400, 401, 409]
 
         if user_doc_ids:
+            file_paths = list(file_paths)
             if not len(file_paths) == len(user_doc_ids):
                 raise LengthNotMatched(
                     "Length of File Path and Length of User Doc Id not Equal."
                 )
+            items = zip(file_paths, user_doc_ids)
         else:
-            user_doc_id = ["" for i in range(len(file_paths))]
-
-        for i in range(len(file_paths)):
-
-            filename = os.path.basename(file_paths[i])
-
-            multipart_form_data = {
-                "files": (filename, open(file_paths[i], "rb")),
-                "type": (None, doc_type),
-                "user_doc_id": (None, user_doc_id[i]),
-                "uploaded_from": (None, "api"),
+            items = ((file_path, "") for file_path in file_paths)
+
+        expires = self._expires(timeout)
+        if self.preflight_checks:
+            with self._until(expires):
+                doc_type = self._document_type(doc_title)
+
+        # files ahead of the current upload: preflight result and, with an
+        # optimizer, the pending compression
+        window = collections.deque()
+        credit_error = None
+
+        def fill():
+            for file_path, user_doc_id in items:
+                rejected = None
+                optimized = None
+                if self.preflight_checks:
+                    try:
+                        check_file(file_path)
+                    except PreflightError as e:
+                        rejected = e
+                if self.optimizer is not None and rejected is None:
+                    optimized = self.optimizer.submit(file_path)
+                window.append((file_path, user_doc_id, rejected, optimized))
+                if self.optimizer is None or len(window) >= prefetch:
+                    return
+
+        def rejection(file_path, metadata, error):
+            return {
+                "file_path": file_path,
+                "uploaded": False,
+                "response": {
+                    "metadata": metadata,
+                    "error": str(error),
+                    "message": "rejected by preflight",
+                    "status": "fail",
+                    "status_code": None,
+                },
             }
 
-            response = requests.post(url, files=multipart_form_data, headers=headers)
+        def upload(file_path, user_doc_id, metadata, optimized):
+            content = None
+            try:
+                upload_name, content = self._file_part(file_path, optimized)
+                multipart_form_data = {
+                    "files": (upload_name, content),
+                    "type": (None, doc_type),
+                    "user_doc_id": (None, user_doc_id),
+                    "uploaded_from": (None, "api"),
+                }
+                response, body = self._retrying(
+                    "upload_files",
+                    "POST",
+                    url,
+                    strict=False,
+                    files=multipart_form_data,
+                    headers=headers,
+                )
+            except Exception as e:
+                # one file failing, e.g. on a timeout, does not end the batch
+                if self.preflight_checks:
+                    self.credits.release()
+                error = {
+                    "metadata": metadata,
+                    "error": "{}: {}".format(type(e).__name__, e),
+                    "message": "upload failed",
+                    "status": "fail",
+                    "status_code": None,
+                }
+                return {"file_path": file_path, "uploaded": False, "response": error}
+            finally:
+                if hasattr(content, "close"):
+                    content.close()
 
             if response.status_code != 200:
+                if self.preflight_checks:
+                    self.credits.release()
 
-                if response.status_code in error_codes:
-                    original_response = response.json()
+                if response.status_code in error_codes and isinstance(body, dict):
                     error = {
-                        "metadata": {"user_doc_id": user_doc_ids[i], "title": filename},
-                        "error": original_response["error"],
-                        "message": original_response["message"],
+                        "metadata": metadata,
+                        "error": body.get("error"),
+                        "message": body.get("message"),
                         "status": "fail",
-                        "status_code": original_response["status_code"],
+                        "status_code": body.get("status_code", response.status_code),
                     }
-                    error_response.append(error)
-
                 else:
                     error = {
-                        "metadata": {"user_doc_id": user_doc_ids[i], "title": filename},
+                        "metadata": metadata,
                         "status": "fail",
                         "status_code": response.status_code,
                     }
+                return {"file_path": file_path, "uploaded": False, "response": error}
+
+            self._uploaded()
+            return {"file_path": file_path, "uploaded": True, "response": body}
+
+        def tasks():
+            nonlocal credit_error
+            fill()
+            while window:
+                file_path, user_doc_id, rejected, optimized = window.popleft()
+                fill()
+
+                filename = os.path.basename(file_path)
+                metadata = {"user_doc_id": user_doc_id, "title": filename}
+
+                if self.preflight_checks and rejected is None:
+                    try:
+                        if credit_error is None:
+                            self._sync_credits()
+                            self.credits.reserve()
+                    except Exception as e:
+                        # the quota is used up or could not be synced, none of the
+                        # remaining files can go
+                        credit_error = e
+                    rejected = credit_error
+
+                if rejected is not None:
+                    if optimized is not None:
+                        optimized.cancel()
+                    yield functools.partial(rejection, file_path, metadata, rejected)
+                else:
+                    yield functools.partial(
+                        upload, file_path, user_doc_id, metadata, optimized
+                    )
 
-            else:
-                original_response = response.json()
-                correct_response.append(original_response)
+        return self._bulk(tasks(), expires=expires)
 
-        final_response = {
-            "files_uploaded": correct_response,
-            "files_not_uploaded": error_response,
-        }
+    def close(self):
+        """Release the connections held by the transport."""
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+        self.transport.close()
 
-        return final_response
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def __str__(self):
         return "Docsumo API"
@@ -1 +1,4 @@
 from .Docsumo import Docsumo
+from .instrumentation import Instrumentation, Metrics, TracingAdapter
+from .jobs import DocumentJob, JobRunner
+from .pool import ClientPool
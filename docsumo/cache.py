@@ -0,0 +1,101 @@
+"""Stale-while-revalidate cache for slowly changing responses"""
+import threading
+import time
+
+
+class _Entry:
+    __slots__ = ("value", "fetched_at", "refreshing")
+
+    def __init__(self, value, fetched_at):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.refreshing = False
+
+
+class StaleWhileRevalidate:
+    """
+    Cache answering from memory for ``ttl`` seconds. Past that the stale
+    value is still returned at once while a background thread fetches a
+    new one, unless it is older than ``max_stale``.
+
+    A failed background refresh keeps the stale value, ``errors`` counts
+    them. Values failing ``valid`` are returned but never cached, so they
+    do not replace a good value either.
+
+    Args:
+        ttl:``float``
+            Seconds a value is fresh.
+        max_stale:``float``
+            Seconds after which a value is not served anymore, ``None``
+            serves stale values however old.
+        valid:``callable``
+            Whether a fetched value may be cached, ``None`` caches every
+            value.
+    """
+
+    def __init__(self, ttl, max_stale=None, valid=None):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.valid = valid
+        self.errors = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, fetch, fresh=False):
+        """
+        Value for ``key``, calling ``fetch()`` when there is none usable.
+
+        Args:
+            fresh:``bool``
+                Skip the cache and wait for ``fetch()``.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not fresh:
+                age = now - entry.fetched_at
+                if age <= self.ttl:
+                    return entry.value
+                if self.max_stale is None or age <= self.max_stale:
+                    if not entry.refreshing:
+                        entry.refreshing = True
+                        threading.Thread(
+                            target=self._refresh, args=(key, entry, fetch), daemon=True
+                        ).start()
+                    return entry.value
+
+        value = fetch()
+        if self.valid is None or self.valid(value):
+            self.set(key, value, now)
+        return value
+
+    def set(self, key, value, fetched_at=None):
+        if fetched_at is None:
+            fetched_at = time.monotonic()
+        with self._lock:
+            current = self._entries.get(key)
+            # an older fetch finishing late does not replace a newer value
+            if current is None or current.fetched_at <= fetched_at:
+                self._entries[key] = _Entry(value, fetched_at)
+
+    def _refresh(self, key, entry, fetch):
+        started = time.monotonic()
+        try:
+            value = fetch()
+            valid = self.valid is None or self.valid(value)
+        except Exception:
+            valid = False
+        if not valid:
+            with self._lock:
+                self.errors += 1
+                entry.refreshing = False
+            return
+        self.set(key, value, started)
+
+    def invalidate(self, key=None):
+        """Drop the value of ``key``, or every value."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
@@ -0,0 +1,395 @@
+"""`docsumo` command line tool for bulk operations"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from . import replay
+from .Docsumo import Docsumo
+from .preprocess import Optimizer
+from .transport import RecordingTransport, RequestsTransport
+
+# client used by the worker processes of ``upload --processes``
+_process_client = None
+
+
+def _client(args, optimizer=None):
+    # a connection per worker, more would be dropped after every request
+    transport = RequestsTransport(pool_maxsize=args.workers)
+    if args.record:
+        transport = RecordingTransport(transport, args.record)
+    return Docsumo(
+        apikey=args.apikey,
+        url=args.url,
+        version=args.version,
+        transport=transport,
+        optimizer=optimizer,
+        timeout=args.timeout,
+    )
+
+
+def _optimizer(args, processes=None):
+    if not args.optimize:
+        return None
+    return Optimizer(
+        target_dpi=args.target_dpi,
+        quality=args.quality,
+        lossless=not args.lossy,
+        processes=processes,
+    )
+
+
+def _expand_paths(paths):
+    """Expand files, directories (recursively) and glob patterns into file paths."""
+    files = []
+    for path in paths:
+        matches = glob.glob(path, recursive=True) if glob.has_magic(path) else [path]
+        for match in sorted(matches):
+            if os.path.isdir(match):
+                for root, _, names in sorted(os.walk(match)):
+                    files.extend(os.path.join(root, name) for name in sorted(names))
+            else:
+                files.append(match)
+    return files
+
+
+def _upload_one(client, file_path, doc_title, user_doc_id):
+    record = {"file": file_path}
+    try:
+        record["response"] = client.upload_file(file_path, doc_title, user_doc_id)
+    except Exception as e:
+        record["error"] = "{}: {}".format(type(e).__name__, e)
+    return record
+
+
+def _init_process(args):
+    global _process_client
+    # the worker processes already use every core, optimize in place
+    _process_client = _client(args, _optimizer(args, processes=0))
+
+
+def _upload_batch(batch, doc_title, workers):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(
+                lambda item: _upload_one(_process_client, item[0], doc_title, item[1]),
+                batch,
+            )
+        )
+
+
+class _Output:
+    """JSONL writer with progress reporting on stderr."""
+
+    def __init__(self, path, total=None, quiet=False):
+        self.stream = open(path, "w") if path and path != "-" else sys.stdout
+        self.total = total
+        self.quiet = quiet
+        self.done = 0
+        self.failed = 0
+
+    def write(self, record, failed=False):
+        self.stream.write(json.dumps(record) + "\n")
+        self.done += 1
+        self.failed += int(failed)
+        if not self.quiet:
+            total = "/{}".format(self.total) if self.total is not None else ""
+            sys.stderr.write(
+                "\r{}{} done, {} failed".format(self.done, total, self.failed)
+            )
+            sys.stderr.flush()
+
+    def close(self):
+        if not self.quiet and self.done:
+            sys.stderr.write("\n")
+        if self.stream is not sys.stdout:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+
+def _failed(record):
+    return "error" in record or record["response"].get("status") != "success"
+
+
+def cmd_upload(args):
+    if args.record and args.processes > 1:
+        # each process would time its records from its own start
+        sys.stderr.write("upload: --record needs a single process\n")
+        return 2
+    files = _expand_paths(args.paths)
+    user_doc_ids = [None] * len(files)
+    if args.user_doc_id_from_name:
+        user_doc_ids = [os.path.splitext(os.path.basename(f))[0] for f in files]
+    items = list(zip(files, user_doc_ids))
+
+    out = _Output(args.output, len(items), args.quiet)
+    try:
+        if args.processes > 1:
+            batch_size = args.workers * 4
+            batches = [
+                items[i : i + batch_size] for i in range(0, len(items), batch_size)
+            ]
+            with ProcessPoolExecutor(
+                max_workers=args.processes,
+                initializer=_init_process,
+                initargs=(args,),
+            ) as executor:
+                futures = [
+                    executor.submit(_upload_batch, batch, args.type, args.workers)
+                    for batch in batches
+                ]
+                for future in as_completed(futures):
+                    for record in future.result():
+                        out.write(record, _failed(record))
+        else:
+            client = _client(args, _optimizer(args))
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                futures = [
+                    executor.submit(_upload_one, client, f, args.type, u)
+                    for f, u in items
+                ]
+                for future in as_completed(futures):
+                    record = future.result()
+                    out.write(record, _failed(record))
+    finally:
+        out.close()
+    if args.optimize and args.processes <= 1:
+        client.optimizer.close()
+        if not args.quiet:
+            sys.stderr.write("{} bytes saved\n".format(client.optimizer.bytes_saved))
+    return 1 if out.failed else 0
+
+
+def cmd_list(args):
+    client = _client(args)
+    out = _Output(args.output, quiet=args.quiet)
+    try:
+        for document in client.documents_iter(
+            status=args.status,
+            created_date_greater_than=args.created_from,
+            created_date_less_than=args.created_to,
+            page_size=args.page_size,
+        ):
+            out.write(document)
+    finally:
+        out.close()
+    return 0
+
+
+def _doc_ids(client, args):
+    if args.doc_ids:
+        return list(args.doc_ids)
+    return [
+        document["doc_id"]
+        for document in client.documents_iter(
+            status=args.status,
+            created_date_greater_than=args.created_from,
+            created_date_less_than=args.created_to,
+            page_size=args.page_size,
+        )
+    ]
+
+
+def _run_per_doc(args, fn):
+    client = _client(args)
+    doc_ids = _doc_ids(client, args)
+
+    def run(doc_id):
+        record = {"doc_id": doc_id}
+        try:
+            record["response"] = fn(client, doc_id)
+        except Exception as e:
+            record["error"] = "{}: {}".format(type(e).__name__, e)
+        return record
+
+    out = _Output(args.output, len(doc_ids), args.quiet)
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = [executor.submit(run, doc_id) for doc_id in doc_ids]
+            for future in as_completed(futures):
+                record = future.result()
+                out.write(record, _failed(record))
+    finally:
+        out.close()
+    return 1 if out.failed else 0
+
+
+def cmd_export(args):
+    if args.ocr:
+        return _run_per_doc(args, lambda client, doc_id: client.extracted_ocr(doc_id))
+    return _run_per_doc(args, lambda client, doc_id: client.extracted_data(doc_id))
+
+
+def _delete(client, doc_id):
+    """Delete a document, answering with the body and HTTP status of the server."""
+    url = "{}/api/{}/eevee/apikey/delete/{}/".format(client.url, client.version, doc_id)
+    response, body = client._retrying(
+        "delete_documents", "POST", url, strict=False, headers={"apikey": client.apikey}
+    )
+    body = body if isinstance(body, dict) else {}
+    status = body.get("status", "success")
+    if response.status_code >= 400 and status == "success":
+        status = "fail"
+    return dict(body, status=status, status_code=response.status_code)
+
+
+def cmd_purge(args):
+    if not args.doc_ids and not args.all:
+        sys.stderr.write("purge: pass doc ids or --all\n")
+        return 2
+    return _run_per_doc(args, _delete)
+
+
+def cmd_summary(args):
+    client = _client(args)
+    out = _Output(args.output, quiet=True)
+    try:
+        out.write(client.documents_summary())
+    finally:
+        out.close()
+    return 0
+
+
+def cmd_replay(args):
+    records = replay.load(args.recording)
+    client = Docsumo(
+        apikey="replay",
+        transport=RequestsTransport(pool_maxsize=args.workers),
+        timeout=args.timeout,
+    )
+    out = _Output(args.output, quiet=True)
+    try:
+        if args.url:
+            report = replay.replay(records, args.url, client, args.speed, args.workers)
+        else:
+            with replay.StandInServer(records, latency=args.latency) as server:
+                report = replay.replay(
+                    records, server.url, client, args.speed, args.workers
+                )
+        out.write(report.to_dict())
+    finally:
+        out.close()
+        client.close()
+    return 0
+
+
+def _add_filters(parser):
+    parser.add_argument("--status", default="", help="document status filter")
+    parser.add_argument(
+        "--from", dest="created_from", default="", help="created date YYYY-MM-DD"
+    )
+    parser.add_argument(
+        "--to", dest="created_to", default="", help="created date YYYY-MM-DD"
+    )
+    parser.add_argument("--page-size", type=int, default=100)
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--apikey", help="defaults to env `DOCSUMO_API_KEY`")
+    common.add_argument("--url", help="url of docsumo api")
+    common.add_argument("--version", default="v1", help="API version")
+    common.add_argument(
+        "-o", "--output", default="-", help="JSONL output file, `-` for stdout"
+    )
+    common.add_argument(
+        "-w", "--workers", type=int, default=8, help="concurrent connections"
+    )
+    common.add_argument(
+        "--timeout", type=float, default=120, help="seconds per request"
+    )
+    common.add_argument("-q", "--quiet", action="store_true", help="hide progress")
+    common.add_argument(
+        "--record", metavar="FILE", help="append a traffic record of every request"
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="docsumo", description="Bulk operations on the Docsumo API."
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    upload = subparsers.add_parser(
+        "upload", parents=[common], help="upload files, directories or globs"
+    )
+    upload.add_argument("paths", nargs="+")
+    upload.add_argument("-t", "--type", required=True, help="document title")
+    upload.add_argument(
+        "--user-doc-id-from-name",
+        action="store_true",
+        help="use the file name without extension as user_doc_id",
+    )
+    upload.add_argument(
+        "-p", "--processes", type=int, default=1, help="worker processes"
+    )
+    upload.add_argument(
+        "--optimize", action="store_true", help="shrink images and PDFs first"
+    )
+    upload.add_argument("--target-dpi", type=int, default=200)
+    upload.add_argument("--quality", type=int, default=85, help="JPEG quality")
+    upload.add_argument("--lossy", action="store_true", help="re-encode images as JPEG")
+    upload.set_defaults(func=cmd_upload)
+
+    list_ = subparsers.add_parser("list", parents=[common], help="list documents")
+    _add_filters(list_)
+    list_.set_defaults(func=cmd_list)
+
+    export = subparsers.add_parser(
+        "export", parents=[common], help="export extracted data"
+    )
+    export.add_argument("doc_ids", nargs="*", help="defaults to all matching documents")
+    export.add_argument("--ocr", action="store_true", help="export ocr instead")
+    _add_filters(export)
+    export.set_defaults(func=cmd_export)
+
+    purge = subparsers.add_parser("purge", parents=[common], help="delete documents")
+    purge.add_argument("doc_ids", nargs="*")
+    purge.add_argument(
+        "--all", action="store_true", help="delete every matching document"
+    )
+    _add_filters(purge)
+    purge.set_defaults(func=cmd_purge)
+
+    summary = subparsers.add_parser(
+        "summary", parents=[common], help="documents summary"
+    )
+    summary.set_defaults(func=cmd_summary)
+
+    replay_ = subparsers.add_parser(
+        "replay", help="replay a traffic record against a local stand-in server"
+    )
+    replay_.add_argument("recording", help="file written by --record")
+    replay_.add_argument(
+        "--speed", type=float, default=1.0, help="speed-up of the recorded schedule"
+    )
+    replay_.add_argument(
+        "--latency",
+        type=float,
+        default=1.0,
+        help="factor applied to the recorded server latencies",
+    )
+    replay_.add_argument("--url", help="replay against this server instead")
+    replay_.add_argument(
+        "-w", "--workers", type=int, default=8, help="concurrent connections"
+    )
+    replay_.add_argument(
+        "--timeout", type=float, default=120, help="seconds per request"
+    )
+    replay_.add_argument(
+        "-o", "--output", default="-", help="JSON report file, `-` for stdout"
+    )
+    replay_.set_defaults(func=cmd_replay)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
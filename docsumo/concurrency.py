@@ -0,0 +1,111 @@
+"""Adaptive limit on concurrent requests"""
+import threading
+import time
+
+# share of each sample moving the latency baseline up
+baseline_drift = 0.01
+
+
+class AdaptiveLimiter:
+    """
+    Limit on requests in flight, adjusted by additive increase and
+    multiplicative decrease (AIMD), the way TCP sizes its window.
+
+    Every request that completes in time raises the limit by ``1 / limit``,
+    so by about one per round of requests. Throttled (429 or 503), failed
+    or slow requests, slower than ``tolerance`` times the lowest recent
+    latency, multiply it by ``backoff``, at most once per round trip.
+
+    Pass it to ``Docsumo(concurrency=...)``, bulk operations then run as
+    many requests at a time as the limit allows. It learns from every
+    request of the client through ``observe``, an ``Instrumentation`` post
+    hook, and can be shared by several clients.
+
+    Args:
+        initial:``int``
+            Starting limit.
+        min_limit:``int``
+            Lowest limit.
+        max_limit:``int``
+            Highest limit, also the number of threads of bulk operations.
+        backoff:``float``
+            Factor applied to the limit on congestion.
+        tolerance:``float``
+            Latency, as a multiple of the baseline, considered congestion.
+    """
+
+    def __init__(
+        self, initial=4, min_limit=1, max_limit=32, backoff=0.5, tolerance=3.0
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.in_flight = 0
+        self._limit = float(initial)
+        self._baseline = None
+        self._decreased = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self):
+        """Current number of requests allowed in flight."""
+        return max(self.min_limit, int(self._limit))
+
+    def acquire(self, blocking=True):
+        """Take a slot, waiting for one unless ``blocking`` is false."""
+        with self._cond:
+            while self.in_flight >= self.limit:
+                if not blocking:
+                    return False
+                self._cond.wait()
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def update(self, latency, failed=False):
+        """
+        Adjust the limit after a request.
+
+        Args:
+            latency:``float``
+                Seconds the request took, ``None`` when unknown.
+            failed:``bool``
+                The request was throttled or failed.
+        """
+        with self._cond:
+            if latency is not None and not failed:
+                if self._baseline is None or latency < self._baseline:
+                    self._baseline = latency
+                else:
+                    self._baseline += (latency - self._baseline) * baseline_drift
+            slow = (
+                latency is not None
+                and self._baseline is not None
+                and latency > self.tolerance * self._baseline
+            )
+
+            if failed or slow:
+                now = time.monotonic()
+                # a burst of congestion signals from one round counts once
+                if now - self._decreased >= (latency or 0.0):
+                    self._limit = max(self.min_limit, self._limit * self.backoff)
+                    self._decreased = now
+            else:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            self._cond.notify_all()
+
+    def observe(self, info):
+        """``Instrumentation`` post hook feeding a ``RequestInfo`` to ``update``."""
+        status_code = info.status_code or 0
+        failed = info.outcome == "exception" or status_code == 429 or status_code >= 500
+        self.update(info.timings.get("total"), failed)
+
+    def __repr__(self):
+        return "AdaptiveLimiter(limit={}, in_flight={})".format(
+            self.limit, self.in_flight
+        )
@@ -8,3 +8,23 @@ class UnsupportedDocumentType(Exception):
 
 class LengthNotMatched(Exception):
     pass
+
+
+class PreflightError(Exception):
+    pass
+
+
+class CreditLimitExceeded(Exception):
+    pass
+
+
+class UploadFailed(Exception):
+    pass
+
+
+class ProcessingTimeout(Exception):
+    pass
+
+
+class DeadlineExceeded(Exception):
+    pass
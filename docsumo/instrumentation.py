@@ -0,0 +1,336 @@
+"""Request hooks, counters and latency histograms for the Docsumo client"""
+import bisect
+import threading
+import time
+
+# upper bounds (seconds) of the latency histogram buckets
+default_buckets = [
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+]
+
+
+class RequestInfo:
+    """
+    Details of a single API call handed to pre and post request hooks.
+
+    Args:
+        name:``str``
+            Client method that issued the call, e.g. ``extracted_data``.
+        method:``str``
+            HTTP method.
+        url:``str``
+            Full request url.
+    Attributes:
+        request_bytes:``int``
+            Size of the request body, ``None`` when it is streamed.
+        response_bytes:``int``
+            Size of the response body.
+        status_code:``int``
+            HTTP status code, ``None`` when no response was received.
+        timings:``dict``
+            Seconds spent per phase: ``wait`` (request sent until response
+            headers parsed), ``transfer`` (connect and body transfer),
+            ``decode`` (JSON decoding) and ``total``.
+        outcome:``str``
+            ``success``, ``http_error``, ``decode_error`` or ``exception``.
+        error:``Exception``
+            Exception raised by the call, if any.
+        context:``dict``
+            Free space for hooks to keep per request state.
+    """
+
+    __slots__ = (
+        "name",
+        "method",
+        "url",
+        "request_bytes",
+        "response_bytes",
+        "status_code",
+        "timings",
+        "outcome",
+        "error",
+        "context",
+    )
+
+    def __init__(self, name, method, url):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.request_bytes = None
+        self.response_bytes = None
+        self.status_code = None
+        self.timings = {}
+        self.outcome = None
+        self.error = None
+        self.context = {}
+
+
+class Histogram:
+    """
+    Fixed bucket histogram.
+
+    Args:
+        buckets:``list``
+            Sorted upper bounds of the buckets.
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = list(buckets or default_buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, q):
+        """
+        Upper bound of the bucket holding the ``q`` quantile (``0 < q <= 1``).
+        Returns ``None`` when nothing has been observed and ``inf`` when the
+        quantile falls past the last bucket.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(zip(self.buckets + [float("inf")], self.counts)),
+        }
+
+
+class Metrics:
+    """
+    Built-in counters and histograms fed by ``Instrumentation``.
+
+    Counters are keyed by ``(name, label)`` where ``name`` is the client
+    method and ``label`` one of ``calls``, ``outcome:<outcome>``,
+    ``status:<code>``, ``bytes_sent``, ``bytes_received``, ``coalesced``,
+    counting reads that shared another caller's request, ``hedged``,
+    counting duplicate reads sent, ``hedge_won``, those answering first, or
+    ``retries``, counting throttled bulk requests sent again.
+    """
+
+    def __init__(self, buckets=None):
+        self._lock = threading.Lock()
+        self._buckets = buckets
+        self.counters = {}
+        self.latency = {}
+        self.phases = {}
+
+    def _incr(self, key, value=1):
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram(self._buckets)
+        return histogram
+
+    def incr(self, name, label, value=1):
+        """Increment an arbitrary counter."""
+        with self._lock:
+            self._incr((name, label), value)
+
+    def record(self, info):
+        """Account a finished ``RequestInfo``."""
+        with self._lock:
+            name = info.name
+            self._incr((name, "calls"))
+            self._incr((name, "outcome:{}".format(info.outcome)))
+            if info.status_code is not None:
+                self._incr((name, "status:{}".format(info.status_code)))
+            if info.request_bytes:
+                self._incr((name, "bytes_sent"), info.request_bytes)
+            if info.response_bytes:
+                self._incr((name, "bytes_received"), info.response_bytes)
+            for phase, seconds in info.timings.items():
+                if phase == "total":
+                    self._histogram(self.latency, name).observe(seconds)
+                else:
+                    self._histogram(self.phases, (name, phase)).observe(seconds)
+
+    def counter(self, name, label):
+        return self.counters.get((name, label), 0)
+
+    def percentile(self, name, q):
+        """Latency percentile for a client method, see ``Histogram.percentile``."""
+        histogram = self.latency.get(name)
+        return histogram.percentile(q) if histogram else None
+
+    def snapshot(self):
+        """
+        Copy of all metrics.
+
+        Returns:
+            Metrics : ``dict``
+
+            .. code-block:: json
+
+                {
+                    'counters': {'extracted_data': {'calls': 2, 'status:200': 2, ...}},
+                    'latency': {'extracted_data': {'count': 2, 'sum': 0.41, 'buckets': {...}}},
+                    'phases': {'extracted_data': {'wait': {...}, 'decode': {...}}}
+                }
+        """
+        with self._lock:
+            counters = {}
+            for (name, label), value in self.counters.items():
+                counters.setdefault(name, {})[label] = value
+            phases = {}
+            for (name, phase), histogram in self.phases.items():
+                phases.setdefault(name, {})[phase] = histogram.to_dict()
+            return {
+                "counters": counters,
+                "latency": {k: v.to_dict() for k, v in self.latency.items()},
+                "phases": phases,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.latency = {}
+            self.phases = {}
+
+
+class TracingAdapter:
+    """
+    Turns every API call into a tracing span.
+
+    Works with any tracer exposing ``start_span(name)`` that returns a span
+    with ``set_attribute(key, value)`` and ``end()``, such as an
+    OpenTelemetry tracer.
+
+    Args:
+        tracer:
+            Tracer used to open spans.
+        prefix:``str``
+            Prefix of the span names.
+    """
+
+    def __init__(self, tracer, prefix="docsumo."):
+        self.tracer = tracer
+        self.prefix = prefix
+
+    def pre(self, info):
+        span = self.tracer.start_span(self.prefix + info.name)
+        span.set_attribute("http.method", info.method)
+        span.set_attribute("http.url", info.url)
+        info.context["span"] = span
+
+    def post(self, info):
+        span = info.context.pop("span", None)
+        if span is None:
+            return
+        if info.status_code is not None:
+            span.set_attribute("http.status_code", info.status_code)
+        if info.request_bytes is not None:
+            span.set_attribute("docsumo.request_bytes", info.request_bytes)
+        if info.response_bytes is not None:
+            span.set_attribute("docsumo.response_bytes", info.response_bytes)
+        span.set_attribute("docsumo.outcome", info.outcome)
+        if info.error is not None:
+            span.set_attribute("error", repr(info.error))
+        span.end()
+
+
+class Instrumentation:
+    """
+    Collection of pre and post request hooks plus built-in ``Metrics``.
+
+    Pass it to ``Docsumo(instrumentation=...)``. When a client has no
+    instrumentation the requests go straight to the transport.
+
+    Args:
+        metrics:``Metrics``
+            Metrics sink, pass ``False`` to disable built-in metrics.
+    """
+
+    def __init__(self, metrics=None):
+        if metrics is False:
+            self.metrics = None
+        else:
+            self.metrics = metrics if metrics is not None else Metrics()
+        self.pre_hooks = []
+        self.post_hooks = []
+
+    def add_pre_hook(self, hook):
+        """``hook(info)`` is called with a ``RequestInfo`` before the request is sent."""
+        self.pre_hooks.append(hook)
+
+    def add_post_hook(self, hook):
+        """``hook(info)`` is called with the completed ``RequestInfo``."""
+        self.post_hooks.append(hook)
+
+    def add_tracer(self, tracer, prefix="docsumo."):
+        """Emit a tracing span per request, see ``TracingAdapter``."""
+        adapter = TracingAdapter(tracer, prefix)
+        self.add_pre_hook(adapter.pre)
+        self.add_post_hook(adapter.post)
+        return adapter
+
+    def call(self, name, method, url, send, strict=True):
+        """
+        Run ``send()`` and decode the JSON body of its response while
+        collecting a ``RequestInfo``.
+
+        Returns:
+            ``(response, dict)``
+        """
+        info = RequestInfo(name, method, url)
+        for hook in self.pre_hooks:
+            hook(info)
+
+        start = time.perf_counter()
+        body = None
+        try:
+            response = send()
+            sent = time.perf_counter()
+            info.status_code = response.status_code
+            info.response_bytes = len(response.content)
+            info.request_bytes = response.request_bytes
+            wait = response.elapsed
+            info.timings["wait"] = wait
+            info.timings["transfer"] = max(sent - start - wait, 0.0)
+            info.outcome = "decode_error"
+            try:
+                body = response.json()
+            except ValueError:
+                if strict:
+                    raise
+            info.timings["decode"] = time.perf_counter() - sent
+            info.outcome = "success" if response.status_code < 400 else "http_error"
+            return response, body
+        except Exception as e:
+            info.error = e
+            if info.outcome is None:
+                info.outcome = "exception"
+            raise
+        finally:
+            info.timings["total"] = time.perf_counter() - start
+            if self.metrics is not None:
+                self.metrics.record(info)
+            for hook in self.post_hooks:
+                hook(info)
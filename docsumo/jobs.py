@@ -0,0 +1,391 @@
+"""End to end document jobs: upload, wait for processing, fetch extracted data"""
+import collections
+import concurrent.futures
+import datetime
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from .error import ProcessingTimeout, UploadFailed
+
+
+class DocumentJob:
+    """
+    Future-like handle of a document going through upload, processing and
+    fetch. Created by ``JobRunner.submit``.
+
+    Attributes:
+        file_path:``str``
+            Path of the uploaded document.
+        doc_id:``str``
+            Docsumo document id, set once the upload succeeded.
+        stage:``str``
+            ``queued`` ``uploading`` ``waiting`` ``fetching`` ``done`` or ``failed``.
+        status:``str``
+            Last document status seen while waiting.
+        upload_response:``dict``
+            Response of ``upload_file``.
+        future:``concurrent.futures.Future``
+            Resolves to the extracted data.
+    """
+
+    def __init__(self, file_path, doc_title, user_doc_id=None):
+        self.file_path = file_path
+        self.doc_title = doc_title
+        self.user_doc_id = user_doc_id
+        self.doc_id = None
+        self.stage = "queued"
+        self.status = None
+        self.upload_response = None
+        self.future = concurrent.futures.Future()
+        self._since = None
+        self._deadline = None
+
+    def result(self, timeout=None):
+        """Extracted data, waiting up to ``timeout`` seconds."""
+        return self.future.result(timeout)
+
+    def exception(self, timeout=None):
+        return self.future.exception(timeout)
+
+    def done(self):
+        return self.future.done()
+
+    def add_done_callback(self, fn):
+        """``fn(job)`` is called once the job is done or failed."""
+        self.future.add_done_callback(lambda _: fn(self))
+
+    def _fail(self, error):
+        self.stage = "failed"
+        if not self.future.done():
+            self.future.set_exception(error)
+
+    def __repr__(self):
+        return "DocumentJob({!r}, stage={!r}, doc_id={!r})".format(
+            self.file_path, self.stage, self.doc_id
+        )
+
+
+def as_completed(jobs, timeout=None):
+    """Yields jobs as they finish, like ``concurrent.futures.as_completed``."""
+    by_future = {job.future: job for job in jobs}
+    for future in concurrent.futures.as_completed(by_future, timeout):
+        yield by_future[future]
+
+
+class _Stage:
+    """Caps how many tasks of one stage run at once on a shared executor."""
+
+    def __init__(self, executor, limit):
+        self.executor = executor
+        self.limit = limit
+        self.running = 0
+        self.queue = collections.deque()
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        with self.lock:
+            if self.running >= self.limit:
+                self.queue.append((fn, args))
+                return
+            self.running += 1
+        self._start(fn, args)
+
+    def _start(self, fn, args):
+        self.executor.submit(fn, *args).add_done_callback(self._done)
+
+    def _done(self, _):
+        with self.lock:
+            if not self.queue:
+                self.running -= 1
+                return
+            fn, args = self.queue.popleft()
+        self._start(fn, args)
+
+
+def _upload_date(upload_response):
+    """Day the document was created, a day early to be safe across time zones."""
+    try:
+        created = parsedate_to_datetime(upload_response["data"]["created_at"])
+    except (KeyError, TypeError, ValueError):
+        created = datetime.datetime.now(datetime.timezone.utc)
+    return (created - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def _status(payload):
+    """Document status carried by a webhook payload, if any."""
+    status = payload.get("status")
+    if isinstance(payload.get("data"), dict):
+        status = payload["data"].get("status", status)
+    return status
+
+
+class JobRunner:
+    """
+    Runs documents through upload, processing and fetch so the stages of
+    different documents overlap.
+
+    Uploads and fetches run on one shared thread pool with separate
+    concurrency limits. Waiting for processing does not hold a thread per
+    document: a single poller checks the status of every pending document
+    with a few ``documents_list`` pages per ``poll_interval``. With a
+    ``WebhookReceiver`` documents move on as soon as their notification
+    arrives and polling only catches missed events.
+
+    Args:
+        client:``Docsumo``
+            Client used for every call.
+        upload_workers:``int``
+            Uploads in flight at once.
+        fetch_workers:``int``
+            Result fetches in flight at once.
+        poll_interval:``float``
+            Seconds between status polls.
+        timeout:``float``
+            Seconds a document may spend processing before its job fails
+            with ``ProcessingTimeout``. ``None`` waits forever.
+        pending_statuses:``list``
+            Document statuses meaning processing has not finished.
+        fetch:
+            ``fetch(client, doc_id)`` returning the job result, defaults to
+            ``client.extracted_data``.
+        page_size:``int``
+            ``documents_list`` page size used by the poller.
+        receiver:``WebhookReceiver``
+            Started receiver delivering processing-complete notifications.
+        max_poll_errors:``int``
+            Consecutive failed polls after which every waiting job fails
+            with the last error, ``None`` keeps polling. Timeouts apply
+            either way.
+    Attributes:
+        poll_errors:``int``
+            Polls that failed, ``last_poll_error`` holds the latest error.
+    """
+
+    def __init__(
+        self,
+        client,
+        upload_workers=4,
+        fetch_workers=4,
+        poll_interval=5.0,
+        timeout=None,
+        pending_statuses=("new",),
+        fetch=None,
+        page_size=100,
+        receiver=None,
+        max_poll_errors=10,
+    ):
+        self.client = client
+        self.receiver = receiver
+        self.max_poll_errors = max_poll_errors
+        self.poll_errors = 0
+        self.last_poll_error = None
+        self._failed_polls = 0
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.pending_statuses = set(pending_statuses)
+        self.fetch = fetch or (lambda client, doc_id: client.extracted_data(doc_id))
+        self.page_size = page_size
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=upload_workers + fetch_workers
+        )
+        self._upload_stage = _Stage(self._executor, upload_workers)
+        self._fetch_stage = _Stage(self._executor, fetch_workers)
+
+        self._pending = {}
+        self._active = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._poller = threading.Thread(target=self._poll_loop, daemon=True)
+        self._poller.start()
+
+    def submit(self, file_path, doc_title, user_doc_id=None):
+        """
+        Queue a document.
+
+        Args:
+            file_path:``str``
+                Path of document to be uploaded.
+            doc_title:``str``
+                Document title, see ``Docsumo.upload_file``.
+            user_doc_id: ``str``
+                document id given by user
+        Returns:
+            ``DocumentJob``
+        """
+        job = DocumentJob(file_path, doc_title, user_doc_id)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("JobRunner is shut down")
+            self._active += 1
+        job.future.add_done_callback(self._finished)
+        self._upload_stage.submit(self._upload, job)
+        return job
+
+    def _finished(self, _):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def map(self, file_paths, doc_title, user_doc_ids=None):
+        """Queue many documents, returns a list of ``DocumentJob``."""
+        user_doc_ids = user_doc_ids or [None] * len(file_paths)
+        return [
+            self.submit(path, doc_title, user_doc_id)
+            for path, user_doc_id in zip(file_paths, user_doc_ids)
+        ]
+
+    def _upload(self, job):
+        job.stage = "uploading"
+        try:
+            response = self.client.upload_file(
+                job.file_path, job.doc_title, job.user_doc_id
+            )
+            job.upload_response = response
+            if response.get("status") != "success":
+                raise UploadFailed(response)
+            job.doc_id = response["data"]["doc_id"]
+        except Exception as e:
+            job._fail(e)
+            return
+
+        job.stage = "waiting"
+        job._since = _upload_date(response)
+        if self.timeout is not None:
+            job._deadline = time.monotonic() + self.timeout
+        with self._condition:
+            if not self._closed:
+                self._pending[job.doc_id] = job
+                self._condition.notify_all()
+                closed = False
+            else:
+                closed = True
+        if closed:
+            job._fail(RuntimeError("JobRunner shut down"))
+        elif self.receiver is not None:
+            doc_id = job.doc_id
+            self.receiver.wait(doc_id).add_done_callback(
+                lambda future: self._ready(doc_id, _status(future.result()))
+            )
+
+    def _ready(self, doc_id, status=None):
+        """Move a pending document on to the fetch stage."""
+        with self._condition:
+            job = self._pending.pop(doc_id, None)
+        if job is None:
+            return False
+        if self.receiver is not None:
+            self.receiver.forget(doc_id)
+        job.status = status
+        job.stage = "fetching"
+        self._fetch_stage.submit(self._fetch, job)
+        return True
+
+    def _fetch(self, job):
+        try:
+            result = self.fetch(self.client, job.doc_id)
+        except Exception as e:
+            job._fail(e)
+            return
+        job.stage = "done"
+        if not job.future.done():
+            job.future.set_result(result)
+
+    def _poll_once(self):
+        with self._condition:
+            pending = dict(self._pending)
+        if not pending:
+            return
+        try:
+            self._list(pending)
+        finally:
+            # deadlines pass whether the listing works or not
+            self._expire(pending)
+
+    def _list(self, pending):
+        since = min(job._since for job in pending.values())
+        seen = 0
+        for document in self.client.documents_iter(
+            created_date_greater_than=since, page_size=self.page_size
+        ):
+            job = pending.get(document["doc_id"])
+            if job is None:
+                continue
+            job.status = document["status"]
+            if document["status"] not in self.pending_statuses:
+                self._ready(document["doc_id"], document["status"])
+            seen += 1
+            if seen == len(pending):
+                break
+
+    def _expire(self, pending):
+        now = time.monotonic()
+        for doc_id, job in pending.items():
+            if job._deadline is None or now <= job._deadline:
+                continue
+            # jobs found processed by this poll or the webhook are kept
+            with self._condition:
+                expired = self._pending.pop(doc_id, None) is job
+            if expired:
+                job._fail(
+                    ProcessingTimeout(
+                        "{} not processed after {}s".format(doc_id, self.timeout)
+                    )
+                )
+
+    def _poll_loop(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                self._condition.wait_for(lambda: self._closed, self.poll_interval)
+                if self._closed:
+                    return
+            try:
+                self._poll_once()
+            except Exception as e:
+                self._poll_failed(e)
+            else:
+                self._failed_polls = 0
+
+    def _poll_failed(self, error):
+        """Count a failed poll, failing the waiting jobs when they keep failing."""
+        pending = []
+        with self._condition:
+            self.poll_errors += 1
+            self.last_poll_error = error
+            self._failed_polls += 1
+            if (
+                self.max_poll_errors is not None
+                and self._failed_polls >= self.max_poll_errors
+            ):
+                pending = list(self._pending.values())
+                self._pending.clear()
+                self._failed_polls = 0
+        for job in pending:
+            job._fail(error)
+
+    def shutdown(self, wait=True):
+        """
+        Stop the runner. With ``wait`` every submitted job is allowed to
+        finish first, otherwise jobs still waiting for processing are failed.
+        """
+        with self._condition:
+            if wait:
+                self._condition.wait_for(lambda: not self._active)
+            self._closed = True
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._condition.notify_all()
+        for job in pending:
+            job._fail(RuntimeError("JobRunner shut down"))
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,301 @@
+"""Local SQLite mirror of the document catalogue"""
+import datetime
+import json
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+schema = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    title TEXT,
+    type TEXT,
+    status TEXT,
+    created_date TEXT,
+    user_doc_id TEXT,
+    document TEXT,
+    refreshed REAL
+);
+CREATE INDEX IF NOT EXISTS documents_status ON documents (status, created_date);
+CREATE INDEX IF NOT EXISTS documents_type ON documents (type, created_date);
+CREATE INDEX IF NOT EXISTS documents_created_date ON documents (created_date);
+CREATE INDEX IF NOT EXISTS documents_user_doc_id ON documents (user_doc_id);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _iso(value):
+    """Created date as sortable ISO 8601, the raw value when it cannot be parsed."""
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).isoformat()
+    except (TypeError, ValueError):
+        return value
+
+
+class DocumentMirror:
+    """
+    Local, indexed copy of the document metadata returned by
+    ``documents_list``, answering list, count and summary queries without
+    calling the API.
+
+    Queries refresh the mirror first when it is older than ``max_age``.
+    Refreshes are incremental: only documents created since the newest
+    mirrored document, or since the oldest one still in a pending status,
+    are read again. Every ``full_max_age`` the refresh reads every document
+    instead, which also drops deleted documents. Changes to older documents
+    and deletions therefore show up within ``full_max_age``.
+
+    Args:
+        client:``Docsumo``
+            Client used to refresh.
+        path:``str``
+            SQLite database file, ``:memory:`` keeps the mirror in memory.
+        max_age:``float``
+            Seconds a refresh stays valid, ``None`` only refreshes on demand.
+        full_max_age:``float``
+            Seconds a full refresh stays valid, ``None`` only reads every
+            document on the first refresh and on demand.
+        pending_statuses:``list``
+            Statuses that may still change, re-read on every refresh.
+        page_size:``int``
+            ``documents_list`` page size used while refreshing.
+    """
+
+    def __init__(
+        self,
+        client,
+        path=":memory:",
+        max_age=300,
+        full_max_age=3600,
+        pending_statuses=("new", "reviewing", "review_required"),
+        page_size=100,
+    ):
+        self.client = client
+        self.max_age = max_age
+        self.full_max_age = full_max_age
+        self.pending_statuses = list(pending_statuses)
+        self.page_size = page_size
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(schema)
+
+    def _meta(self, key):
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+        )
+
+    @property
+    def refreshed_at(self):
+        """Unix time of the last refresh, ``None`` before the first one."""
+        with self._lock:
+            value = self._meta("refreshed_at")
+        return float(value) if value is not None else None
+
+    @property
+    def full_refreshed_at(self):
+        """Unix time of the last full refresh, ``None`` before the first one."""
+        with self._lock:
+            value = self._meta("full_refreshed_at")
+        return float(value) if value is not None else None
+
+    def _since(self):
+        """Day from which an incremental refresh reads documents."""
+        placeholders = ",".join("?" * len(self.pending_statuses))
+        row = self._db.execute(
+            "SELECT MIN(created_date) FROM documents WHERE status IN ({})".format(
+                placeholders
+            ),
+            self.pending_statuses,
+        ).fetchone()
+        newest = self._db.execute("SELECT MAX(created_date) FROM documents").fetchone()
+        since = min(d for d in (row[0], newest[0]) if d) if newest[0] else None
+        if since is None:
+            return ""
+        try:
+            day = datetime.date.fromisoformat(since[:10])
+        except ValueError:
+            return ""
+        # a day early so time zones never hide a document
+        return (day - datetime.timedelta(days=1)).isoformat()
+
+    def refresh(self, full=False):
+        """
+        Read changed documents from the API.
+
+        Args:
+            full:``bool``
+                Read every document and drop the ones no longer listed.
+        Returns:
+            Number of documents read : ``int``
+        """
+        with self._lock:
+            started = time.time()
+            since = "" if full else self._since()
+            rows = []
+            for document in self.client.documents_iter(
+                created_date_greater_than=since, page_size=self.page_size
+            ):
+                rows.append(
+                    (
+                        document["doc_id"],
+                        document.get("title"),
+                        document.get("type"),
+                        document.get("status"),
+                        _iso(
+                            document.get("created_date") or document.get("created_at")
+                        ),
+                        document.get("user_doc_id"),
+                        json.dumps(document),
+                        started,
+                    )
+                )
+
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                if full:
+                    self._db.execute(
+                        "DELETE FROM documents WHERE refreshed < ?", (started,)
+                    )
+                    self._set_meta("full_refreshed_at", started)
+                self._set_meta("refreshed_at", started)
+            return len(rows)
+
+    def ensure_fresh(self):
+        """
+        Refresh when the mirror is older than ``max_age``, in full when the
+        last full refresh is older than ``full_max_age``.
+        """
+        now = time.time()
+        refreshed_at = self.refreshed_at
+        full_refreshed_at = self.full_refreshed_at
+        if full_refreshed_at is None or (
+            self.full_max_age is not None
+            and now - full_refreshed_at > self.full_max_age
+        ):
+            self.refresh(full=True)
+        elif self.max_age is not None and now - refreshed_at > self.max_age:
+            self.refresh()
+
+    @staticmethod
+    def _where(
+        status, created_date_greater_than, created_date_less_than, type, user_doc_id
+    ):
+        clauses = []
+        params = []
+        if status:
+            statuses = [status] if isinstance(status, str) else list(status)
+            clauses.append("status IN ({})".format(",".join("?" * len(statuses))))
+            params.extend(statuses)
+        if type:
+            clauses.append("type = ?")
+            params.append(type)
+        if user_doc_id:
+            clauses.append("user_doc_id = ?")
+            params.append(user_doc_id)
+        if created_date_greater_than:
+            clauses.append("created_date >= ?")
+            params.append(created_date_greater_than)
+        if created_date_less_than:
+            # inclusive of the whole day
+            clauses.append("created_date < ?")
+            params.append(created_date_less_than + "\uffff")
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+    def documents_list(
+        self,
+        offset=0,
+        limit=20,
+        status="",
+        created_date_greater_than="",
+        created_date_less_than="",
+        type=None,
+        user_doc_id=None,
+    ):
+        """
+        Same as ``Docsumo.documents_list``, answered from the mirror, with
+        extra ``type`` and ``user_doc_id`` filters.
+        """
+        self.ensure_fresh()
+        where, params = self._where(
+            status, created_date_greater_than, created_date_less_than, type, user_doc_id
+        )
+        with self._lock:
+            total = self._db.execute(
+                "SELECT COUNT(*) FROM documents" + where, params
+            ).fetchone()[0]
+            rows = self._db.execute(
+                "SELECT document FROM documents{} "
+                "ORDER BY created_date DESC, doc_id LIMIT ? OFFSET ?".format(where),
+                params + [limit, offset],
+            ).fetchall()
+        return {
+            "data": {
+                "documents": [json.loads(row[0]) for row in rows],
+                "limit": limit,
+                "offset": offset,
+                "total": total,
+            },
+            "error": "",
+            "error_code": "",
+            "message": "",
+            "status": "success",
+            "status_code": 200,
+        }
+
+    def count(
+        self,
+        status="",
+        created_date_greater_than="",
+        created_date_less_than="",
+        type=None,
+        user_doc_id=None,
+    ):
+        """Number of mirrored documents matching the filters."""
+        self.ensure_fresh()
+        where, params = self._where(
+            status, created_date_greater_than, created_date_less_than, type, user_doc_id
+        )
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM documents" + where, params
+            ).fetchone()[0]
+
+    def documents_summary(self, type=None):
+        """Same as ``Docsumo.documents_summary``, answered from the mirror."""
+        self.ensure_fresh()
+        where, params = self._where("", "", "", type, None)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) FROM documents{} GROUP BY status".format(
+                    where
+                ),
+                params,
+            ).fetchall()
+        return {
+            "data": dict(rows),
+            "error": "",
+            "error_code": "",
+            "message": "",
+            "status": "success",
+            "status_code": 200,
+        }
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,99 @@
+"""Streaming multipart/form-data bodies"""
+import os
+import uuid
+
+chunk_size = 64 * 1024
+
+
+def _quote(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _stream_length(stream):
+    """Bytes left in a seekable stream, ``None`` when it cannot be told."""
+    try:
+        if not stream.seekable():
+            return None
+        position = stream.tell()
+        try:
+            return os.fstat(stream.fileno()).st_size - position
+        except (AttributeError, OSError, ValueError):
+            end = stream.seek(0, os.SEEK_END)
+            stream.seek(position)
+            return end - position
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class MultipartStream:
+    """
+    ``multipart/form-data`` body that sends one file part straight from its
+    source: ``bytes`` and ``memoryview`` content goes out as zero copy
+    slices, file objects are read chunk by chunk. The body is never
+    assembled in memory.
+
+    Iterate over it to get the body chunks. Like the ``requests_toolbelt``
+    encoder it has a ``len`` attribute holding the body size, set only when
+    the size of the content is known, so transports can send a
+    Content-Length instead of chunked encoding.
+
+    Args:
+        fields:``dict``
+            Plain form fields, name to ``str`` value.
+        file_field:``str``
+            Name of the file part.
+        filename:``str``
+            File name of the file part.
+        content:
+            ``bytes``, ``bytearray``, ``memoryview`` or a readable file object.
+        length:``int``
+            Size of a file object's content, when it cannot be told by seeking.
+    """
+
+    def __init__(self, fields, file_field, filename, content, length=None):
+        self.boundary = uuid.uuid4().hex
+        self.filename = filename
+        self.content = content
+
+        head = []
+        for name, value in fields.items():
+            head.append(
+                '--{}\r\nContent-Disposition: form-data; name="{}"\r\n\r\n{}\r\n'.format(
+                    self.boundary, _quote(name), value
+                )
+            )
+        head.append(
+            "--{}\r\nContent-Disposition: form-data; "
+            'name="{}"; filename="{}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n".format(
+                self.boundary, _quote(file_field), _quote(filename)
+            )
+        )
+        self.head = "".join(head).encode()
+        self.tail = "\r\n--{}--\r\n".format(self.boundary).encode()
+
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            length = memoryview(content).nbytes
+        elif length is None:
+            length = _stream_length(content)
+        if length is not None:
+            self.len = len(self.head) + length + len(self.tail)
+
+    @property
+    def content_type(self):
+        return "multipart/form-data; boundary={}".format(self.boundary)
+
+    def __iter__(self):
+        yield self.head
+        content = self.content
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            view = memoryview(content).cast("B")
+            for start in range(0, len(view), chunk_size):
+                yield view[start : start + chunk_size]
+        else:
+            while True:
+                chunk = content.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        yield self.tail
@@ -0,0 +1,311 @@
+"""Bulk conversion of extracted values to typed NumPy arrays"""
+
+# two digit years below this are read as 20xx, others as 19xx
+century_pivot = 70
+
+_space = (0, 9, 32, 160)
+
+# code point classes
+_digit, _separator, _ignored, _negative, _sign, _blank, _bad = range(7)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("normalization needs `pip install numpy`")
+    return numpy
+
+
+def _text(value):
+    """Field value as ``str``."""
+    if isinstance(value, dict):
+        value = value.get("value")
+    return "" if value is None else str(value)
+
+
+class Column:
+    """
+    Typed values of a column.
+
+    Args:
+        values:``numpy.ndarray``
+            Parsed values, ``nan``, ``NaT`` or ``0`` where ``valid`` is false.
+        null:``numpy.ndarray``
+            Boolean mask of empty values.
+        invalid:``numpy.ndarray``
+            Boolean mask of values that could not be parsed.
+        raw:``numpy.ndarray``
+            Values as strings.
+        index:``numpy.ndarray``
+            Row each value comes from, when list values were flattened.
+    """
+
+    def __init__(self, values, null, invalid, raw, index=None):
+        self.values = values
+        self.null = null
+        self.invalid = invalid
+        self.raw = raw
+        self.index = index
+
+    @property
+    def valid(self):
+        return ~(self.null | self.invalid)
+
+    @property
+    def errors(self):
+        """``(position, raw value)`` of every value that could not be parsed."""
+        return [(int(i), str(self.raw[i])) for i in self.invalid.nonzero()[0]]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return "Column({!r}, errors={})".format(self.values, int(self.invalid.sum()))
+
+
+class Parser:
+    """
+    Column parser compiled once for a kind of value and a number format,
+    then applied to whole columns at once.
+
+    Strings are turned into a matrix of code points and scanned one
+    character position at a time across all values, so the work done in
+    Python depends on the length of the longest value, not on the number
+    of values.
+
+    Kinds:
+
+    - ``amount``: ``float64``, currency symbols, spaces, thousands
+      separators, signs and parentheses for negatives are allowed. Signs,
+      parentheses and spaces may not come between digits.
+    - ``decimal``: exact amounts as ``int64`` counts of ``10 ** -scale``
+      units, e.g. cents for ``scale=2``.
+    - ``int``: ``int64``.
+    - ``date``: ``datetime64[D]`` from three numbers in ``order``, with any
+      of ``/ - . ,`` or spaces between them. Dates starting with a four
+      digit year are read as ``YMD``.
+
+    Args:
+        kind:``str``
+            ``amount``, ``decimal``, ``int`` or ``date``.
+        decimal:``str``
+            Decimal separator.
+        thousands:``str``
+            Thousands separator, ignored.
+        scale:``int``
+            Decimal places kept by ``decimal``.
+        order:``str``
+            Order of the date parts, ``MDY``, ``DMY`` or ``YMD``.
+    """
+
+    kinds = ("amount", "decimal", "int", "date")
+
+    def __init__(self, kind, decimal=".", thousands=",", scale=2, order="MDY"):
+        if kind not in self.kinds:
+            raise ValueError("Unknown kind {!r}, one of {}".format(kind, self.kinds))
+        if sorted(order) != ["D", "M", "Y"]:
+            raise ValueError("Invalid date order: {!r}".format(order))
+        np = _numpy()
+        self.kind = kind
+        self.scale = scale if kind == "decimal" else 0
+        self.order = order
+
+        # class of every code point, those above 255 share the last entry
+        table = np.full(256, _bad, dtype=np.uint8)
+        table[list(_space)] = _blank
+        if kind == "date":
+            table[list(map(ord, "/-.,"))] = _ignored
+        else:
+            # currency symbols
+            table[128:] = _ignored
+            table[[ord(thousands), ord("$")]] = _ignored
+            table[[ord("+"), ord(")")]] = _sign
+            table[[ord("-"), ord("(")]] = _negative
+            table[ord(decimal)] = _separator
+        table[48:58] = _digit
+        self._table = table
+
+    def parse(self, values):
+        """
+        Parse a column.
+
+        Args:
+            values:``list``
+                Strings, numbers, ``None`` or extracted fields holding a
+                ``value``.
+        Returns:
+            ``Column``
+        """
+        np = _numpy()
+        raw = np.array(
+            [value if value.__class__ is str else _text(value) for value in values],
+            dtype=str,
+        )
+        if raw.itemsize == 0:
+            raw = raw.astype("U1")
+        # one row per character position, scanned across all values at once
+        codes = raw.view(np.uint32).reshape(len(raw), raw.itemsize // 4)
+        codes = np.ascontiguousarray(codes.T)
+        classes = self._table[np.minimum(codes, 255)]
+        null = (classes == _blank).all(axis=0)
+
+        if self.kind == "date":
+            parsed, invalid = self._dates(classes, codes)
+        else:
+            parsed, invalid = self._numbers(classes, codes)
+        invalid &= ~null
+        return Column(parsed, null, invalid, raw)
+
+    def _numbers(self, classes, codes):
+        np = _numpy()
+        floating = self.kind == "amount"
+        rows = codes.shape[1]
+        acc = np.zeros(rows, dtype=np.float64 if floating else np.int64)
+        count = np.zeros(rows, dtype=np.int64)
+        fraction = np.zeros(rows, dtype=np.int64)
+        separators = np.zeros(rows, dtype=np.int64)
+        negatives = np.zeros(rows, dtype=np.int64)
+        after_decimal = np.zeros(rows, dtype=bool)
+        # a blank or sign followed the digits, no digit may come after it
+        ended = np.zeros(rows, dtype=bool)
+        split = np.zeros(rows, dtype=bool)
+
+        for kind, code in zip(classes, codes):
+            digit = kind == _digit
+            split |= digit & ended
+            acc = np.where(digit, acc * 10 + code.astype(acc.dtype) - 48, acc)
+            count += digit
+            fraction += digit & after_decimal
+            separator = kind == _separator
+            separators += separator
+            after_decimal |= separator
+            negative = kind == _negative
+            negatives += negative
+            ended |= (count > 0) & (negative | (kind == _sign) | (kind == _blank))
+
+        # int64 holds 18 digits, scaling adds ``scale`` more
+        bad = (classes == _bad).any(axis=0) | (count == 0)
+        bad |= (count + self.scale > 18) | split | (separators > 1) | (negatives > 1)
+        negative = negatives == 1
+
+        if floating:
+            values = acc / 10.0**fraction
+        else:
+            excess = np.maximum(fraction - self.scale, 0)
+            divisor = 10 ** np.minimum(excess, 18)
+            bad |= acc % divisor != 0
+            values = acc // divisor * 10 ** np.clip(self.scale - fraction, 0, 18)
+        values = np.where(negative, -values, values)
+        values[bad] = np.nan if floating else 0
+        return values, bad
+
+    def _dates(self, classes, codes):
+        np = _numpy()
+        rows = codes.shape[1]
+        parts = np.zeros((3, rows), dtype=np.int64)
+        counts = np.zeros((3, rows), dtype=np.int64)
+        group = np.full(rows, -1, dtype=np.int64)
+        previous = np.zeros(rows, dtype=bool)
+
+        for kind, code in zip(classes, codes):
+            digit = kind == _digit
+            group += digit & ~previous
+            for i in range(3):
+                member = digit & (group == i)
+                parts[i] = np.where(member, parts[i] * 10 + code - 48, parts[i])
+                counts[i] += member
+            previous = digit
+
+        bad = (classes == _bad).any(axis=0) | (group != 2) | (counts > 4).any(axis=0)
+        # a four digit first number is an ISO 8601 date, whatever the order
+        iso = counts[0] == 4
+        year = np.where(iso, parts[0], parts[self.order.index("Y")])
+        month = np.where(iso, parts[1], parts[self.order.index("M")])
+        day = np.where(iso, parts[2], parts[self.order.index("D")])
+        century = np.where(year < century_pivot, 2000, 1900)
+        year = np.where(year < 100, year + century, year)
+        bad |= (month < 1) | (month > 12) | (day < 1)
+        year[bad], month[bad], day[bad] = 1970, 1, 1
+
+        months = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+        start = months.astype("datetime64[D]")
+        length = ((months + 1).astype("datetime64[D]") - start).astype(np.int64)
+        bad |= day > length
+        values = start + (day - 1).astype("timedelta64[D]")
+        values[bad] = np.datetime64("NaT")
+        return values, bad
+
+
+def _parser(spec):
+    return spec if isinstance(spec, Parser) else Parser(spec)
+
+
+def normalize(rows, columns):
+    """
+    Parse columns of many rows, such as those of
+    ``Docsumo.extracted_fields_iter``.
+
+    Columns holding lists, like ``transactions[*].amount``, are flattened:
+    their ``Column.index`` gives the row of each value.
+
+    Args:
+        rows:``list``
+            Rows as ``dict``.
+        columns:``dict``
+            Column name to ``Parser`` or kind.
+    Returns:
+        Column name to ``Column`` : ``dict``
+    """
+    np = _numpy()
+    rows = list(rows)
+    result = {}
+    for name, spec in columns.items():
+        values = [row.get(name) for row in rows]
+        if any(isinstance(value, list) for value in values):
+            flat = []
+            index = []
+            for i, value in enumerate(values):
+                items = value if isinstance(value, list) else [value]
+                flat.extend(items)
+                index.extend([i] * len(items))
+            column = _parser(spec).parse(flat)
+            column.index = np.array(index, dtype=np.int64)
+        else:
+            column = _parser(spec).parse(values)
+        result[name] = column
+    return result
+
+
+def line_items(responses, table, columns):
+    """
+    Parse the line items of a table, e.g. ``transactions``, across many
+    ``extracted_data`` responses.
+
+    Args:
+        responses:``list``
+            ``extracted_data`` responses.
+        table:``str``
+            Key of the table in ``data``.
+        columns:``dict``
+            Line item field to ``Parser`` or kind.
+    Returns:
+        Field name to ``Column``, whose ``index`` gives the response of
+        each line item : ``dict``
+    """
+    np = _numpy()
+    items = []
+    index = []
+    for i, response in enumerate(responses):
+        data = response.get("data") or {}
+        for item in data.get(table) or []:
+            items.append(item)
+            index.append(i)
+    index = np.array(index, dtype=np.int64)
+
+    result = {}
+    for name, spec in columns.items():
+        column = _parser(spec).parse([item.get(name) for item in items])
+        column.index = index
+        result[name] = column
+    return result
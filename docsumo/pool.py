@@ -0,0 +1,315 @@
+"""Many API keys on one connection pool and executor"""
+import collections
+import concurrent.futures
+import threading
+import time
+
+from .Docsumo import Docsumo
+from .instrumentation import Instrumentation
+from .transport import RequestsTransport, Transport
+
+# work of the pool running in the current thread
+_local = threading.local()
+
+
+class RateLimiter:
+    """
+    Token bucket holding back requests beyond ``rate`` per second, with
+    bursts of up to ``burst`` requests.
+
+    Use it as an ``Instrumentation`` pre hook, it blocks until the request
+    may be sent. Within work run by a ``ClientPool`` it never blocks: the
+    pool only starts work of a key once its bucket has a token.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate, burst=None):
+        """Change the rate, and the burst size unless ``None``."""
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            if burst is not None:
+                self.burst = burst
+
+    def delay(self):
+        """Seconds until a token is available, ``0`` when there is one."""
+        with self._lock:
+            self._refill()
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+    def take(self):
+        """Take a token without waiting, going into debt when there is none."""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def __call__(self, info):
+        if getattr(_local, "prepaid", None) is None:
+            self.acquire()
+        elif _local.prepaid:
+            # the pool took the token of the first request when starting the work
+            _local.prepaid = False
+        else:
+            self.take()
+
+
+class _SharedTransport(Transport):
+    """Transport of the pool as seen by a handle, which may not close it."""
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def request(self, *args, **kwargs):
+        return self.transport.request(*args, **kwargs)
+
+
+class _Tenant:
+    def __init__(self, client, limiter):
+        self.client = client
+        self.limiter = limiter
+        self.queue = collections.deque()
+        self.waiting = False
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+
+class ClientPool:
+    """
+    Hands out ``Docsumo`` handles for many API keys that share one
+    transport, so one connection pool, and one executor.
+
+    Work submitted for a key runs on the shared executor. Pending work is
+    taken from the keys in turn, so a large batch for one key only delays
+    the others by one task per worker. Each key gets its own metrics and,
+    optionally, a rate limit on its requests.
+
+    Rate limits never hold a worker: work of a key is only started once
+    the key has a token for its first request, keys without one are set
+    aside until their next token is due. Further requests of the same work
+    take tokens in advance, delaying the next work of that key.
+
+    Args:
+        url:``str``
+            Url of docsumo api.
+        version:``str``
+            API version.
+        transport:``Transport``
+            Shared HTTP engine, defaults to a ``RequestsTransport`` with one
+            connection per worker.
+        workers:``int``
+            Threads of the shared executor.
+        rate:``float``
+            Default requests per second allowed per key, ``None`` for no limit.
+        burst:``int``
+            Default burst size of the rate limit.
+    """
+
+    def __init__(
+        self, url=None, version="v1", transport=None, workers=8, rate=None, burst=None
+    ):
+        self.url = url
+        self.version = version
+        self.workers = workers
+        self.rate = rate
+        self.burst = burst
+        self.transport = (
+            transport
+            if transport is not None
+            else RequestsTransport(pool_maxsize=workers)
+        )
+        self._shared = _SharedTransport(self.transport)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self._tenants = {}
+        self._ready = collections.deque()
+        self._waiting = 0
+        self._running = 0
+        self._closed = False
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def client(self, apikey, rate=None, burst=None):
+        """
+        Handle for an API key, created on first use.
+
+        Args:
+            rate:``float``
+                Requests per second for this key, overrides the pool default.
+                Changes the limit of a key already in use.
+            burst:``int``
+                Burst size for this key.
+        Returns:
+            ``Docsumo``
+        """
+        return self._tenant(apikey, rate, burst).client
+
+    def _tenant(self, apikey, rate=None, burst=None):
+        with self._lock:
+            tenant = self._tenants.get(apikey)
+            if tenant is None:
+                rate = rate if rate is not None else self.rate
+                client = Docsumo(
+                    apikey=apikey,
+                    url=self.url,
+                    version=self.version,
+                    instrumentation=Instrumentation(),
+                    transport=self._shared,
+                )
+                tenant = self._tenants[apikey] = _Tenant(client, None)
+            if rate:
+                burst = burst if burst else self.burst
+                if tenant.limiter is None:
+                    tenant.limiter = RateLimiter(rate, burst)
+                    tenant.client.instrumentation.add_pre_hook(tenant.limiter)
+                else:
+                    tenant.limiter.set_rate(rate, burst)
+            return tenant
+
+    def submit(self, apikey, fn, *args, **kwargs):
+        """
+        Schedule ``fn(client, *args, **kwargs)`` with the handle of ``apikey``.
+
+        Returns:
+            ``concurrent.futures.Future``
+        """
+        tenant = self._tenant(apikey)
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("cannot schedule new work after shutdown")
+            if not tenant.queue and not tenant.waiting:
+                self._ready.append(tenant)
+            tenant.queue.append((future, fn, args, kwargs))
+            tenant.submitted += 1
+        self._dispatch()
+        return future
+
+    def map(self, apikey, fn, iterable):
+        """Schedule ``fn(client, item)`` for every item, returning the futures."""
+        return [self.submit(apikey, fn, item) for item in iterable]
+
+    def _dispatch(self):
+        with self._lock:
+            while not self._stopped and self._running < self.workers and self._ready:
+                tenant = self._ready.popleft()
+                if tenant.limiter is not None:
+                    delay = tenant.limiter.delay()
+                    if delay > 0:
+                        tenant.waiting = True
+                        self._waiting += 1
+                        timer = threading.Timer(delay, self._wake, (tenant,))
+                        timer.daemon = True
+                        timer.start()
+                        continue
+                    tenant.limiter.take()
+                task = tenant.queue.popleft()
+                if tenant.queue:
+                    self._ready.append(tenant)
+                self._running += 1
+                tenant.running += 1
+                self._executor.submit(self._run, tenant, *task)
+
+    def _wake(self, tenant):
+        """Put a key back in turn once its next token is due."""
+        with self._lock:
+            tenant.waiting = False
+            self._waiting -= 1
+            if tenant.queue:
+                self._ready.append(tenant)
+            self._idle.notify_all()
+        self._dispatch()
+
+    def _run(self, tenant, future, fn, args, kwargs):
+        failed = False
+        if future.set_running_or_notify_cancel():
+            _local.prepaid = tenant.limiter is not None
+            try:
+                result = fn(tenant.client, *args, **kwargs)
+            except BaseException as e:
+                failed = True
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                _local.prepaid = None
+        with self._lock:
+            self._running -= 1
+            tenant.running -= 1
+            tenant.completed += 1
+            tenant.failed += failed
+            self._idle.notify_all()
+        self._dispatch()
+
+    def stats(self, apikey=None):
+        """
+        Work and request metrics per key.
+
+        Returns:
+            Stats of every key, or of ``apikey`` only : ``dict``
+
+            .. code-block:: json
+
+                {
+                    'pending': 3,
+                    'running': 2,
+                    'submitted': 10,
+                    'completed': 5,
+                    'failed': 1,
+                    'metrics': {'counters': {...}, 'latency': {...}, 'phases': {...}}
+                }
+        """
+        with self._lock:
+            tenants = dict(self._tenants)
+        if apikey is not None:
+            tenants = {apikey: tenants[apikey]}
+        stats = {}
+        for key, tenant in tenants.items():
+            stats[key] = {
+                "pending": len(tenant.queue),
+                "running": tenant.running,
+                "submitted": tenant.submitted,
+                "completed": tenant.completed,
+                "failed": tenant.failed,
+                "metrics": tenant.client.metrics.snapshot(),
+            }
+        return stats[apikey] if apikey is not None else stats
+
+    def shutdown(self, wait=True):
+        """Stop accepting work and, with ``wait``, finish the pending work first."""
+        with self._lock:
+            self._closed = True
+            if wait:
+                while self._running or self._ready or self._waiting:
+                    self._idle.wait()
+            self._stopped = True
+        self._executor.shutdown(wait=wait)
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,188 @@
+"""Local checks run before a document is uploaded"""
+import os
+import threading
+import time
+
+from .error import CreditLimitExceeded, PreflightError
+
+# leading bytes of the supported file formats
+signatures = [
+    (b"%PDF-", "pdf"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+]
+
+extension_kinds = {
+    ".pdf": "pdf",
+    ".png": "png",
+    ".jpg": "jpeg",
+    ".jpeg": "jpeg",
+    ".tif": "tiff",
+    ".tiff": "tiff",
+}
+
+# bytes read from the end of a file to look for its trailer
+tail_size = 1024
+
+
+def detect_kind(head):
+    """File format from the first bytes of a file, ``None`` when unknown."""
+    for signature, kind in signatures:
+        if head.startswith(signature):
+            return kind
+    return None
+
+
+def _intact(kind, head, tail, size):
+    if kind == "pdf":
+        return b"%%EOF" in tail
+    if kind == "png":
+        return tail.rstrip(b"\x00").endswith(b"IEND\xaeB`\x82")
+    if kind == "jpeg":
+        return tail.rstrip(b"\x00\r\n").endswith(b"\xff\xd9")
+    if kind == "tiff":
+        byteorder = "little" if head[:2] == b"II" else "big"
+        offset = int.from_bytes(head[4:8], byteorder)
+        return 8 <= offset < size
+    return True
+
+
+def _check(name, head, tail, size):
+    ext = os.path.splitext(name)[1].lower()
+    if ext not in extension_kinds:
+        raise PreflightError(
+            "{} has unsupported extension. Supported: {}".format(
+                name, sorted(extension_kinds)
+            )
+        )
+    if not size:
+        raise PreflightError("{} is empty".format(name))
+
+    kind = detect_kind(head)
+    if kind != extension_kinds[ext]:
+        raise PreflightError(
+            "{} content is {}, expected {}".format(
+                name, kind or "unknown", extension_kinds[ext]
+            )
+        )
+    if not _intact(kind, head, tail, size):
+        raise PreflightError("{} is truncated or corrupt".format(name))
+    return kind
+
+
+def check_file(file_path):
+    """
+    Check that a file is a supported, complete document.
+
+    Args:
+        file_path:``str``
+            Path of document.
+    Returns:
+        File format : ``str`` one of ``pdf`` ``png`` ``jpeg`` ``tiff``
+    Raises:
+        ``PreflightError`` for missing or unreadable files, unsupported
+        extensions, empty files, content not matching the extension and
+        truncated files.
+    """
+    try:
+        size = os.path.getsize(file_path)
+        with open(file_path, "rb") as f:
+            head = f.read(16)
+            f.seek(max(size - tail_size, 0))
+            tail = f.read()
+    except OSError as e:
+        raise PreflightError("{} cannot be read: {}".format(file_path, e))
+    return _check(file_path, head, tail, size)
+
+
+def check_bytes(content, filename):
+    """
+    ``check_file`` for in-memory content.
+
+    Args:
+        content:``bytes``
+            ``bytes``, ``bytearray`` or ``memoryview`` of the document.
+        filename:``str``
+            Name the document is uploaded with.
+    """
+    view = memoryview(content).cast("B")
+    size = len(view)
+    return _check(
+        filename,
+        bytes(view[:16]),
+        bytes(view[max(size - tail_size, 0) :]),
+        size,
+    )
+
+
+class CreditTracker:
+    """
+    Local count of the documents the user can still upload this month.
+    Credits reserved for uploads in flight are kept apart from the count
+    of the server, so ``update`` can sync with it at any time.
+
+    Args:
+        limit:``int``
+            ``monthly_doc_limit`` from ``user_detail_credit_limit``.
+        used:``int``
+            ``monthly_doc_current`` from ``user_detail_credit_limit``.
+    """
+
+    def __init__(self, limit, used):
+        self.limit = limit
+        self.used = used
+        self.pending = 0
+        self.synced = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_user_detail(cls, user_detail):
+        """Build from the ``data`` of ``user_detail_credit_limit``."""
+        return cls(user_detail["monthly_doc_limit"], user_detail["monthly_doc_current"])
+
+    def update(self, user_detail):
+        """Sync with the ``data`` of a newer ``user_detail_credit_limit``."""
+        with self._lock:
+            self.limit = user_detail["monthly_doc_limit"]
+            self.used = user_detail["monthly_doc_current"] + self.pending
+            self.synced = time.monotonic()
+
+    def due(self, interval):
+        """
+        Whether the credits ran out more than ``interval`` seconds after the
+        last sync. Only one caller is told so, and is expected to ``update``.
+        """
+        with self._lock:
+            if self.used < self.limit or time.monotonic() - self.synced < interval:
+                return False
+            self.synced = time.monotonic()
+            return True
+
+    @property
+    def remaining(self):
+        return max(self.limit - self.used, 0)
+
+    def reserve(self, count=1):
+        """Take credits for uploads about to start, raise ``CreditLimitExceeded`` when short."""
+        with self._lock:
+            if self.used + count > self.limit:
+                raise CreditLimitExceeded(
+                    "monthly document limit of {} reached ({} used)".format(
+                        self.limit, self.used
+                    )
+                )
+            self.used += count
+            self.pending += count
+
+    def release(self, count=1):
+        """Give back credits of uploads that were rejected."""
+        with self._lock:
+            self.used = max(self.used - count, 0)
+            self.pending = max(self.pending - count, 0)
+
+    def settle(self, count=1):
+        """Mark credits of uploads that succeeded as counted by the server."""
+        with self._lock:
+            self.pending = max(self.pending - count, 0)
@@ -0,0 +1,226 @@
+"""Shrink images and PDFs before they are uploaded"""
+import io
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+image_extensions = [".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp"]
+
+
+class OptimizedFile:
+    """
+    Result of optimizing a file.
+
+    Args:
+        file_path:``str``
+            Path of the original file.
+        filename:``str``
+            File name to upload with, the extension changes when the format does.
+        content:``bytes``
+            Bytes to upload.
+        original_bytes:``int``
+            Size of the original file.
+        error:``str``
+            Why the file could not be optimized, its original bytes are
+            uploaded then.
+    """
+
+    __slots__ = ("file_path", "filename", "content", "original_bytes", "error")
+
+    def __init__(self, file_path, filename, content, original_bytes, error=None):
+        self.file_path = file_path
+        self.filename = filename
+        self.content = content
+        self.original_bytes = original_bytes
+        self.error = error
+
+    @property
+    def optimized_bytes(self):
+        return len(self.content)
+
+    @property
+    def bytes_saved(self):
+        return self.original_bytes - self.optimized_bytes
+
+    def to_dict(self):
+        result = {
+            "file": self.file_path,
+            "filename": self.filename,
+            "original_bytes": self.original_bytes,
+            "optimized_bytes": self.optimized_bytes,
+            "bytes_saved": self.bytes_saved,
+        }
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+
+def _optimize_image(content, filename, target_dpi, quality, lossless):
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError("image optimization needs `pip install pillow`")
+
+    name, ext = os.path.splitext(filename)
+    if lossless and ext.lower() in (".jpg", ".jpeg"):
+        # any re-encoding of a JPEG loses detail
+        return filename, content
+
+    image = Image.open(io.BytesIO(content))
+    if getattr(image, "n_frames", 1) > 1:
+        # multi page tiffs are left alone
+        return filename, content
+
+    dpi = image.info.get("dpi")
+    if dpi and target_dpi and max(dpi) > target_dpi:
+        scale = float(target_dpi) / max(dpi)
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+        dpi = (target_dpi, target_dpi)
+
+    save = {"dpi": dpi} if dpi else {}
+    out = io.BytesIO()
+    if lossless:
+        if ext.lower() in (".tif", ".tiff"):
+            image.save(out, "TIFF", compression="tiff_deflate", **save)
+        else:
+            image.save(out, "PNG", optimize=True, **save)
+            ext = ".png"
+    else:
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(out, "JPEG", quality=quality, optimize=True, **save)
+        ext = ".jpg"
+    return name + ext, out.getvalue()
+
+
+def _optimize_pdf(content, filename):
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError:
+        raise ImportError("pdf optimization needs `pip install pypdf`")
+
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(content)))
+    for page in writer.pages:
+        page.compress_content_streams()
+    writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    out = io.BytesIO()
+    writer.write(out)
+    return filename, out.getvalue()
+
+
+def optimize_file(file_path, target_dpi=200, quality=85, lossless=True):
+    """
+    Downscale and recompress an image, or compact a PDF.
+
+    The original bytes are kept when the result is not smaller, the file
+    type is not handled or the file cannot be decoded, leaving it to the
+    API to accept or reject. ``OptimizedFile.error`` tells why then.
+
+    Args:
+        file_path:``str``
+            Path of the file.
+        target_dpi:``int``
+            Images with a higher resolution are scaled down to it.
+        quality:``int``
+            JPEG quality used when ``lossless`` is ``False``.
+        lossless:``bool``
+            Keep the image format and only recompress losslessly, JPEGs are
+            left untouched. Otherwise re-encode as JPEG at ``quality``.
+    Returns:
+        ``OptimizedFile``
+    """
+    filename = os.path.basename(file_path)
+    with open(file_path, "rb") as f:
+        content = f.read()
+
+    ext = os.path.splitext(filename)[1].lower()
+    error = None
+    try:
+        if ext in image_extensions:
+            new_filename, new_content = _optimize_image(
+                content, filename, target_dpi, quality, lossless
+            )
+        elif ext == ".pdf":
+            new_filename, new_content = _optimize_pdf(content, filename)
+        else:
+            new_filename, new_content = filename, content
+    except ImportError:
+        raise
+    except Exception as e:
+        error = "{}: {}".format(type(e).__name__, e)
+        new_filename, new_content = filename, content
+
+    if len(new_content) >= len(content):
+        new_filename, new_content = filename, content
+    return OptimizedFile(file_path, new_filename, new_content, len(content), error)
+
+
+class Optimizer:
+    """
+    Runs ``optimize_file`` in a process pool so the upload threads keep
+    the network busy while files are being compressed.
+
+    Args:
+        target_dpi:``int``
+            Resolution images are scaled down to.
+        quality:``int``
+            JPEG quality used when ``lossless`` is ``False``.
+        lossless:``bool``
+            Only recompress losslessly, JPEGs are left untouched.
+        processes:``int``
+            Size of the process pool, defaults to the number of CPUs.
+            ``0`` optimizes in the calling thread.
+    Attributes:
+        report:``list``
+            ``OptimizedFile.to_dict()`` of every optimized file.
+    """
+
+    def __init__(self, target_dpi=200, quality=85, lossless=True, processes=None):
+        self.target_dpi = target_dpi
+        self.quality = quality
+        self.lossless = lossless
+        self.processes = processes
+        self.report = []
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def bytes_saved(self):
+        return sum(item["bytes_saved"] for item in self.report)
+
+    def _record(self, future):
+        if not future.cancelled() and future.exception() is None:
+            with self._lock:
+                self.report.append(future.result().to_dict())
+
+    def submit(self, file_path):
+        """
+        Schedule a file for optimization.
+
+        Returns:
+            ``Future`` resolving to an ``OptimizedFile``.
+        """
+        args = (file_path, self.target_dpi, self.quality, self.lossless)
+        if self.processes == 0:
+            future = Future()
+            try:
+                future.set_result(optimize_file(*args))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.processes)
+            future = self._executor.submit(optimize_file, *args)
+        future.add_done_callback(self._record)
+        return future
+
+    def optimize(self, file_path):
+        """Optimize a single file and wait for the ``OptimizedFile``."""
+        return self.submit(file_path).result()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
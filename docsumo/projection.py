@@ -0,0 +1,132 @@
+"""Compiled field paths over extracted data"""
+import re
+
+_token = re.compile(r"\[(\*|-?\d+)\]|(?:^|\.)([^.\[\]]+)")
+_all = object()
+
+
+def _leaf(node, position):
+    """Value of an extracted field, with its position when asked for."""
+    if isinstance(node, dict) and "value" in node:
+        if position:
+            return node["value"], node.get("position")
+        return node["value"]
+    if position:
+        return node, None
+    return node
+
+
+def _walk(node, steps, position):
+    for i, step in enumerate(steps):
+        if step is _all:
+            if not isinstance(node, list):
+                return None
+            return [_walk(item, steps[i + 1 :], position) for item in node]
+        try:
+            node = node[step]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return _leaf(node, position)
+
+
+class FieldPath:
+    """
+    Path to a field of ``extracted_data``, relative to its ``data``.
+
+    Segments are separated by dots, ``[n]`` picks an item of a list and
+    ``[*]`` every item, e.g. ``invoice.number`` or ``transactions[*].amount``.
+    Fields holding a ``value`` resolve to it, missing ones to ``None``.
+
+    Args:
+        path:``str``
+            Field path.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        steps = []
+        end = 0
+        for match in _token.finditer(path):
+            if match.start() != end:
+                break
+            index, key = match.groups()
+            if key is not None:
+                steps.append(key)
+            elif index == "*":
+                steps.append(_all)
+            else:
+                steps.append(int(index))
+            end = match.end()
+        if not steps or end != len(path):
+            raise ValueError("Invalid field path: {!r}".format(path))
+        self.steps = tuple(steps)
+
+    def extract(self, data, position=False):
+        """
+        Value of the field in ``data``, a list per ``[*]``.
+
+        Args:
+            position:``bool``
+                Resolve fields to ``(value, position)`` instead.
+        """
+        return _walk(data, self.steps, position)
+
+    def __repr__(self):
+        return "FieldPath({!r})".format(self.path)
+
+
+class Projection:
+    """
+    Set of compiled field paths turning ``extracted_data`` responses into
+    flat rows.
+
+    Only the requested paths are walked. Rows are keyed by field path, plus
+    ``<path>.position`` columns when ``position`` is set.
+
+    Args:
+        fields:``list``
+            Field paths, ``str`` or ``FieldPath``.
+        position:``bool``
+            Add the position of each field.
+    """
+
+    def __init__(self, fields, position=False):
+        self.fields = [f if isinstance(f, FieldPath) else FieldPath(f) for f in fields]
+        self.position = position
+
+    @property
+    def columns(self):
+        columns = []
+        for field in self.fields:
+            columns.append(field.path)
+            if self.position:
+                columns.append(field.path + ".position")
+        return columns
+
+    def row(self, response):
+        """
+        Row of an ``extracted_data`` response.
+
+        Returns:
+            Field values : ``dict``
+        """
+        data = response.get("data") if isinstance(response, dict) else None
+        row = {}
+        for field in self.fields:
+            if not self.position:
+                row[field.path] = field.extract(data)
+                continue
+            value, position = _split(field.extract(data, position=True))
+            row[field.path] = value
+            row[field.path + ".position"] = position
+        return row
+
+
+def _split(found):
+    """Separate the values and positions of a ``[*]`` match."""
+    if isinstance(found, tuple):
+        return found
+    if found is None:
+        return None, None
+    pairs = [_split(item) for item in found]
+    return [p[0] for p in pairs], [p[1] for p in pairs]
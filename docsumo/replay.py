@@ -0,0 +1,261 @@
+"""Replay of recorded traffic against a local stand-in server"""
+import collections
+import concurrent.futures
+import http.server
+import itertools
+import json
+import threading
+import time
+
+from .Docsumo import Docsumo
+from .transport import RequestsTransport, endpoint
+
+
+def load(path):
+    """Records of a ``RecordingTransport`` file, in order of start time."""
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted(records, key=lambda record: record["start"])
+
+
+def _body(size):
+    """JSON body of ``size`` bytes."""
+    return b"{}" + b" " * max(0, (size or 0) - 2)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _answer(self):
+        self._read_body()
+        record = self.server.sample(self.command, self.path)
+        if record is None:
+            status, body, delay = 404, _body(0), 0.0
+        else:
+            # calls that raised, e.g. on timeouts, fail after as long
+            status = record["status"] or 502
+            body = _body(record["response_bytes"])
+            delay = record["elapsed"] * self.server.latency
+        if delay > 0:
+            time.sleep(delay)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _answer
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                # chunk and its trailing CRLF
+                self.rfile.read(size + 2)
+                if not size:
+                    return
+        remaining = int(self.headers.get("Content-Length") or 0)
+        while remaining > 0:
+            chunk = self.rfile.read(min(remaining, 1 << 16))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(http.server.ThreadingHTTPServer):
+    """
+    Local HTTP server answering like the recorded API did. Requests to an
+    endpoint cycle through the status codes, response sizes and latencies
+    recorded for it, with bodies of blank JSON. Unknown endpoints get a
+    404.
+
+    .. code-block:: python
+
+        with StandInServer(load("traffic.jsonl")) as server:
+            print(server.url)
+
+    Args:
+        records:``list``
+            Records of a ``RecordingTransport``.
+        latency:``float``
+            Factor applied to the recorded latencies, ``0`` answers at once
+            to measure the client alone.
+        address:``tuple``
+            ``(host, port)`` to listen on, port ``0`` picks a free one.
+    Attributes:
+        url:``str``
+            Base url of the server.
+        served:``int``
+            Requests answered.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, records, latency=1.0, address=("127.0.0.1", 0)):
+        samples = collections.defaultdict(list)
+        for record in records:
+            samples[record["method"], record["endpoint"]].append(record)
+        self._samples = {key: itertools.cycle(value) for key, value in samples.items()}
+        self.latency = latency
+        self.served = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        super().__init__(address, _Handler)
+        self.url = "http://{}:{}".format(*self.server_address[:2])
+
+    def sample(self, method, path):
+        """Record answering a request, ``None`` for unknown endpoints."""
+        with self._lock:
+            self.served += 1
+            samples = self._samples.get((method, endpoint(path)))
+            return None if samples is None else next(samples)
+
+    def start(self):
+        """Serve from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class Report:
+    """
+    Outcome of a ``replay``.
+
+    Args:
+        results:``list``
+            ``(latency, lag, status)`` of every request, ``status`` is
+            ``None`` when it raised.
+        duration:``float``
+            Seconds from the first request until the last answer.
+    """
+
+    def __init__(self, results, duration):
+        self.latencies = sorted(latency for latency, _, _ in results)
+        self.statuses = collections.Counter(status for _, _, status in results)
+        self.max_lag = max((lag for _, lag, _ in results), default=0.0)
+        self.duration = duration
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    @property
+    def errors(self):
+        """Requests that raised or got a 5xx."""
+        return sum(
+            count
+            for status, count in self.statuses.items()
+            if status is None or status >= 500
+        )
+
+    @property
+    def throughput(self):
+        """Requests per second."""
+        return self.requests / self.duration if self.duration else 0.0
+
+    def percentile(self, q):
+        """Latency of the ``q`` quantile (``0 < q <= 1``), ``None`` without requests."""
+        if not self.latencies:
+            return None
+        rank = max(1, int(round(q * len(self.latencies))))
+        return self.latencies[rank - 1]
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "duration": self.duration,
+            "throughput": self.throughput,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "max_lag": self.max_lag,
+            "statuses": {
+                "error" if status is None else str(status): count
+                for status, count in sorted(
+                    self.statuses.items(), key=lambda item: item[0] or 0
+                )
+            },
+        }
+
+
+def replay(records, url, client=None, speed=1.0, concurrency=8):
+    """
+    Send the requests of a recording to ``url`` again, usually a
+    ``StandInServer``, with the recorded gaps between them divided by
+    ``speed``.
+
+    Requests start on schedule whatever earlier ones do, as real traffic
+    would, unless all ``concurrency`` workers are busy. ``Report.max_lag``
+    then shows how far behind schedule they fell: raise ``speed`` until it
+    grows to find the throughput ceiling of a client and its settings.
+
+    Ids are replaced by a different stand-in id for every request and
+    bodies by as many bytes as recorded.
+
+    Args:
+        records:``list``
+            Records of a ``RecordingTransport``, see ``load``.
+        url:``str``
+            Base url of the server.
+        client:``Docsumo``
+            Client sending the requests, its ``url`` is ignored. Defaults
+            to one on a ``RequestsTransport`` with ``concurrency``
+            connections.
+        speed:``float``
+            Speed-up of the recorded schedule.
+        concurrency:``int``
+            Requests in flight at most.
+    Returns:
+        ``Report``
+    """
+    if client is None:
+        client = Docsumo(
+            apikey="replay", transport=RequestsTransport(pool_maxsize=concurrency)
+        )
+    records = sorted(records, key=lambda record: record["start"])
+    base = url.rstrip("/")
+
+    def send(i, record, due):
+        started = time.perf_counter()
+        target = base + record["endpoint"].replace("{id}", "{:024x}".format(i))
+        size = record.get("request_bytes") or 0
+        kwargs = {"data": b"x" * size} if size else {}
+        try:
+            response, _ = client._request(
+                record["endpoint"], record["method"], target, strict=False, **kwargs
+            )
+            status = response.status_code
+        except Exception:
+            status = None
+        return time.perf_counter() - started, started - due, status
+
+    begin = time.perf_counter()
+    first = records[0]["start"] if records else 0.0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = []
+        for i, record in enumerate(records):
+            due = begin + (record["start"] - first) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(send, i, record, due))
+        results = [future.result() for future in futures]
+    return Report(results, time.perf_counter() - begin)
@@ -0,0 +1,57 @@
+"""Sharing one in-flight call between identical concurrent calls"""
+import concurrent.futures
+import threading
+
+from .error import DeadlineExceeded
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers arriving while the
+    call for their key is in flight wait for it and get its result, or
+    its exception, instead of running their own.
+
+    ``merged`` counts the calls answered that way.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.merged = 0
+
+    def do(self, key, fn, timeout=None):
+        """
+        Result of ``fn()``, shared with concurrent calls for the same ``key``.
+
+        Args:
+            timeout:``float``
+                Seconds to wait for another caller's call before raising
+                ``DeadlineExceeded``.
+        Returns:
+            ``(result, merged)`` where ``merged`` tells whether the result
+            came from another caller's call.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = concurrent.futures.Future()
+            else:
+                self.merged += 1
+        if not leader:
+            done, _ = concurrent.futures.wait([future], timeout=timeout)
+            if not done:
+                raise DeadlineExceeded("Deadline exceeded")
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                del self._calls[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._calls[key]
+        future.set_result(result)
+        return result, False
@@ -0,0 +1,443 @@
+"""HTTP transports used by the Docsumo client"""
+import json as jsonlib
+import os
+import re
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class Response:
+    """
+    Transport independent HTTP response.
+
+    Args:
+        status_code:``int``
+            HTTP status code.
+        content:``bytes``
+            Response body.
+        headers:``dict``
+            Response headers.
+        elapsed:``float``
+            Seconds from sending the request until the response headers arrived.
+        request_bytes:``int``
+            Size of the request body, ``None`` when it was streamed.
+    """
+
+    __slots__ = ("status_code", "content", "headers", "elapsed", "request_bytes")
+
+    def __init__(
+        self, status_code, content=b"", headers=None, elapsed=0.0, request_bytes=0
+    ):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.elapsed = elapsed
+        self.request_bytes = request_bytes
+
+    def json(self):
+        return jsonlib.loads(self.content)
+
+
+class Request:
+    """Request as seen by ``MockTransport`` handlers."""
+
+    __slots__ = ("method", "url", "headers", "params", "json", "data", "files")
+
+    def __init__(
+        self, method, url, headers=None, params=None, json=None, data=None, files=None
+    ):
+        self.method = method
+        self.url = url
+        self.headers = headers or {}
+        self.params = params or {}
+        self.json = json
+        self.data = data
+        self.files = files
+
+
+def _body_size(body):
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray, str)):
+        return len(body)
+    # streamed bodies of known size, see ``MultipartStream``
+    return getattr(body, "len", None)
+
+
+def _read(value):
+    """Content of a multipart value given as bytes, str or a file object."""
+    if hasattr(value, "read"):
+        return value.read()
+    return value
+
+
+class Transport:
+    """
+    Interface of the HTTP engine behind ``Docsumo``.
+
+    ``files`` follows the ``requests`` convention: a dict of field name to
+    ``(filename, content)`` where content is bytes or a file object and
+    ``filename`` is ``None`` for plain form fields.
+    """
+
+    def request(
+        self,
+        method,
+        url,
+        headers=None,
+        params=None,
+        json=None,
+        data=None,
+        files=None,
+        timeout=None,
+    ):
+        """
+        Send a request.
+
+        Returns:
+            ``Response``
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class RequestsTransport(Transport):
+    """
+    Transport on a pooled ``requests.Session``.
+
+    Args:
+        pool_maxsize:``int``
+            Connections kept alive per host.
+    """
+
+    def __init__(self, pool_maxsize=10):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(
+        self,
+        method,
+        url,
+        headers=None,
+        params=None,
+        json=None,
+        data=None,
+        files=None,
+        timeout=None,
+    ):
+        response = self.session.request(
+            method,
+            url,
+            headers=headers,
+            params=params,
+            json=json,
+            data=data,
+            files=files,
+            timeout=timeout,
+        )
+        return Response(
+            response.status_code,
+            response.content,
+            response.headers,
+            response.elapsed.total_seconds(),
+            _body_size(response.request.body),
+        )
+
+    def close(self):
+        self.session.close()
+
+
+class Urllib3Transport(Transport):
+    """
+    Transport on a raw ``urllib3.PoolManager``, skipping the ``requests``
+    layer.
+
+    Args:
+        maxsize:``int``
+            Connections kept alive per host.
+    """
+
+    def __init__(self, maxsize=10):
+        import urllib3
+
+        self._urllib3 = urllib3
+        self.pool = urllib3.PoolManager(maxsize=maxsize, block=False)
+
+    def request(
+        self,
+        method,
+        url,
+        headers=None,
+        params=None,
+        json=None,
+        data=None,
+        files=None,
+        timeout=None,
+    ):
+        headers = dict(headers or {})
+        if params:
+            url = "{}?{}".format(url, urlencode(params, doseq=True))
+
+        body = data
+        if files is not None:
+            fields = {}
+            for name, (filename, value) in files.items():
+                value = _read(value)
+                fields[name] = value if filename is None else (filename, value)
+            body, content_type = self._urllib3.encode_multipart_formdata(fields)
+            headers["Content-Type"] = content_type
+        elif json is not None:
+            body = jsonlib.dumps(json).encode()
+            headers["Content-Type"] = "application/json"
+        elif hasattr(body, "len"):
+            headers["Content-Length"] = str(body.len)
+
+        start = time.perf_counter()
+        response = self.pool.request(
+            method,
+            url,
+            body=body,
+            headers=headers,
+            timeout=timeout,
+            preload_content=False,
+            chunked=body is not None and _body_size(body) is None,
+        )
+        elapsed = time.perf_counter() - start
+        content = response.read()
+        response.release_conn()
+        return Response(
+            response.status, content, response.headers, elapsed, _body_size(body)
+        )
+
+    def close(self):
+        self.pool.clear()
+
+
+class HTTP2Transport(Transport):
+    """
+    HTTP/2 transport on ``httpx``. Concurrent calls from many threads are
+    multiplexed over a single connection per host.
+
+    Needs ``pip install httpx[http2]``.
+
+    Args:
+        max_connections:``int``
+            Upper bound of open connections.
+    """
+
+    def __init__(self, max_connections=10):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("HTTP2Transport needs `pip install httpx[http2]`")
+
+        self.client = httpx.Client(
+            http2=True, limits=httpx.Limits(max_connections=max_connections)
+        )
+
+    def request(
+        self,
+        method,
+        url,
+        headers=None,
+        params=None,
+        json=None,
+        data=None,
+        files=None,
+        timeout=None,
+    ):
+        kwargs = {"headers": headers, "params": params, "timeout": timeout}
+        if files is not None:
+            kwargs["data"] = {n: v for n, (f, v) in files.items() if f is None}
+            kwargs["files"] = {
+                n: (f, v) for n, (f, v) in files.items() if f is not None
+            }
+        elif json is not None:
+            kwargs["json"] = json
+        elif data is not None:
+            kwargs["content"] = data
+            if hasattr(data, "len"):
+                kwargs["headers"] = dict(
+                    headers or {}, **{"Content-Length": str(data.len)}
+                )
+
+        response = self.client.request(method, url, **kwargs)
+        if files is not None:
+            request_bytes = None
+        elif data is not None:
+            request_bytes = _body_size(data)
+        else:
+            request_bytes = len(response.request.content)
+        return Response(
+            response.status_code,
+            response.content,
+            response.headers,
+            response.elapsed.total_seconds(),
+            request_bytes,
+        )
+
+    def close(self):
+        self.client.close()
+
+
+class MockTransport(Transport):
+    """
+    In-memory transport for tests.
+
+    Args:
+        handler:
+            ``handler(request)`` receives a ``Request`` and returns a
+            ``Response``, a ``(status_code, body)`` tuple or a body. Bodies
+            that are not bytes are JSON encoded.
+    Attributes:
+        requests:``list``
+            Every ``Request`` received, in order.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def request(
+        self,
+        method,
+        url,
+        headers=None,
+        params=None,
+        json=None,
+        data=None,
+        files=None,
+        timeout=None,
+    ):
+        request = Request(method, url, headers, params, json, data, files)
+        with self._lock:
+            self.requests.append(request)
+
+        start = time.perf_counter()
+        result = self.handler(request)
+        if isinstance(result, Response):
+            return result
+
+        status_code = 200
+        if isinstance(result, tuple):
+            status_code, result = result
+        if not isinstance(result, bytes):
+            result = jsonlib.dumps(result).encode()
+        request_bytes = (
+            len(jsonlib.dumps(json)) if json is not None else _body_size(data)
+        )
+        return Response(
+            status_code,
+            result,
+            {"Content-Type": "application/json"},
+            time.perf_counter() - start,
+            request_bytes,
+        )
+
+
+# path segments kept by ``endpoint``, others are ids
+_static_segment = re.compile(r"^(v\d+|[A-Za-z_-]*)$")
+
+
+def endpoint(url):
+    """
+    Path of ``url`` with ids replaced by ``{id}``, e.g.
+    ``/api/v1/eevee/apikey/data/{id}/``.
+    """
+    segments = re.sub("/+", "/", urlsplit(url).path).split("/")
+    return "/".join(s if _static_segment.match(s) else "{id}" for s in segments)
+
+
+class RecordingTransport(Transport):
+    """
+    Transport logging every call of ``transport`` as a line of JSON: start
+    time in seconds since the recording began, method, ``endpoint``,
+    request and response sizes in bytes, status code and seconds taken.
+    Bodies, headers and ids are left out, so recordings can be shared.
+    Calls that raised have a ``null`` status and the ``error`` type.
+
+    ``docsumo.replay`` plays recordings back against a local server.
+
+    Args:
+        transport:``Transport``
+            Transport sending the requests.
+        path:``str``
+            File the records are appended to, or an open text file.
+    """
+
+    def __init__(self, transport, path):
+        self.transport = transport
+        self._owned = not hasattr(path, "write")
+        self.stream = open(os.fspath(path), "a") if self._owned else path
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def request(
+        self,
+        method,
+        url,
+        headers=None,
+        params=None,
+        json=None,
+        data=None,
+        files=None,
+        timeout=None,
+    ):
+        record = {
+            "start": None,
+            "method": method,
+            "endpoint": endpoint(url),
+            "request_bytes": None,
+            "status": None,
+            "response_bytes": None,
+            "elapsed": None,
+        }
+        start = time.perf_counter()
+        try:
+            response = self.transport.request(
+                method,
+                url,
+                headers=headers,
+                params=params,
+                json=json,
+                data=data,
+                files=files,
+                timeout=timeout,
+            )
+        except Exception as e:
+            record["error"] = type(e).__name__
+            if json is not None:
+                record["request_bytes"] = len(jsonlib.dumps(json))
+            elif files is None:
+                record["request_bytes"] = _body_size(data)
+            raise
+        else:
+            record["request_bytes"] = response.request_bytes
+            record["status"] = response.status_code
+            record["response_bytes"] = len(response.content)
+            return response
+        finally:
+            record["start"] = round(start - self._started, 6)
+            record["elapsed"] = round(time.perf_counter() - start, 6)
+            self._write(record)
+
+    def _write(self, record):
+        line = jsonlib.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+    def close(self):
+        with self._lock:
+            if self._owned:
+                self.stream.close()
+        self.transport.close()
@@ -0,0 +1,155 @@
+"""Embeddable HTTP receiver for processing-complete webhooks"""
+import collections
+import concurrent.futures
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _doc_id(payload):
+    """``doc_id`` of a webhook payload, at the top level or under ``data``."""
+    if not isinstance(payload, dict):
+        return None
+    doc_id = payload.get("doc_id")
+    if doc_id is None and isinstance(payload.get("data"), dict):
+        doc_id = payload["data"].get("doc_id")
+    return doc_id
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _reply(self, status_code, body):
+        content = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self):
+        receiver = self.server.receiver
+        url = urlparse(self.path)
+        if url.path != receiver.path:
+            return self._reply(404, {"status": "fail", "error": "not found"})
+        if receiver.token and parse_qs(url.query).get("token") != [receiver.token]:
+            return self._reply(403, {"status": "fail", "error": "bad token"})
+
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length))
+        except ValueError:
+            return self._reply(400, {"status": "fail", "error": "invalid json"})
+
+        doc_id = _doc_id(payload)
+        if doc_id is None:
+            return self._reply(400, {"status": "fail", "error": "missing doc_id"})
+        receiver.resolve(doc_id, payload)
+        self._reply(200, {"status": "success"})
+
+    def log_message(self, *args):
+        pass
+
+
+class WebhookReceiver:
+    """
+    Small HTTP server that accepts processing-complete notifications and
+    resolves waiting futures and callbacks by ``doc_id``.
+
+    Payloads are JSON objects carrying ``doc_id`` at the top level or under
+    ``data``. Notifications that arrive before anyone waits for the document
+    are kept (up to ``backlog`` of them) so no event is lost.
+
+    Args:
+        host:``str``
+            Interface to listen on.
+        port:``int``
+            Port to listen on, ``0`` picks a free one.
+        path:``str``
+            Path the notifications are posted to.
+        token:``str``
+            When set, requests must carry ``?token=<token>``.
+        backlog:``int``
+            Unclaimed notifications kept in memory.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, path="/", token=None, backlog=10000):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.token = token
+        self.backlog = backlog
+        self._waiters = {}
+        self._events = collections.OrderedDict()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """Url to configure as webhook."""
+        host, port = self._server.server_address[:2]
+        url = "http://{}:{}{}".format(host, port, self.path)
+        if self.token:
+            url += "?token={}".format(self.token)
+        return url
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.receiver = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def on_complete(self, callback):
+        """``callback(doc_id, payload)`` is called for every notification."""
+        self._callbacks.append(callback)
+
+    def wait(self, doc_id):
+        """
+        Future resolving to the notification payload of a document.
+
+        Returns:
+            ``concurrent.futures.Future``
+        """
+        with self._lock:
+            if doc_id in self._events:
+                future = concurrent.futures.Future()
+                future.set_result(self._events.pop(doc_id))
+                return future
+            future = self._waiters.get(doc_id)
+            if future is None:
+                future = self._waiters[doc_id] = concurrent.futures.Future()
+            return future
+
+    def forget(self, doc_id):
+        """Drop the waiter of a document resolved some other way, e.g. by polling."""
+        with self._lock:
+            self._waiters.pop(doc_id, None)
+            self._events.pop(doc_id, None)
+
+    def resolve(self, doc_id, payload):
+        """Deliver a notification, as done for every accepted POST."""
+        with self._lock:
+            future = self._waiters.pop(doc_id, None)
+            if future is None:
+                self._events[doc_id] = payload
+                while len(self._events) > self.backlog:
+                    self._events.popitem(last=False)
+        if future is not None and not future.done():
+            future.set_result(payload)
+        for callback in self._callbacks:
+            callback(doc_id, payload)
@@ -16,6 +16,12 @@ setup(
     python_requires=">=3",
     packages=["docsumo"],
     install_requires=["requests"],
+    extras_require={
+        "http2": ["httpx[http2]"],
+        "optimize": ["pillow", "pypdf"],
+        "numpy": ["numpy"],
+    },
+    entry_points={"console_scripts": ["docsumo=docsumo.cli:main"]},
     classifiers=[
         "Intended Audience :: Education",
         "Intended Audience :: Science/Research",
@@ -0,0 +1,137 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from docsumo import Docsumo
+from docsumo.cache import StaleWhileRevalidate
+from docsumo.transport import MockTransport
+
+
+class Account:
+    def __init__(self):
+        self.current = 10
+        self.limit_calls = 0
+
+    def __call__(self, request):
+        if request.url.endswith("/limit/"):
+            self.limit_calls += 1
+            return {
+                "status": "success",
+                "data": {
+                    "monthly_doc_current": self.current,
+                    "monthly_doc_limit": 20,
+                    "document_types": [{"title": "Invoice", "value": "invoice"}],
+                },
+            }
+        if request.url.endswith("/upload/"):
+            self.current += 1
+            return {"status": "success", "data": {"doc_id": "abc"}}
+        return {"status": "success", "data": {"new": 1}}
+
+
+class TestStaleWhileRevalidate(unittest.TestCase):
+    def test_serves_stale_while_refreshing(self):
+        cache = StaleWhileRevalidate(ttl=0.05)
+        values = iter(range(100))
+        refreshed = threading.Event()
+
+        def fetch():
+            value = next(values)
+            if value == 1:
+                refreshed.set()
+            return value
+
+        self.assertEqual(cache.get("k", fetch), 0)
+        self.assertEqual(cache.get("k", fetch), 0)
+        time.sleep(0.06)
+        self.assertEqual(cache.get("k", fetch), 0)
+        refreshed.wait(5)
+        for _ in range(100):
+            if cache.get("k", fetch) == 1:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.get("k", fetch), 1)
+        self.assertEqual(cache.get("k", fetch, fresh=True), 2)
+
+    def test_failed_refresh_keeps_value(self):
+        cache = StaleWhileRevalidate(ttl=0, max_stale=0.2)
+        cache.set("k", "old")
+
+        def fail():
+            raise ConnectionError()
+
+        self.assertEqual(cache.get("k", fail), "old")
+        for _ in range(100):
+            if cache.errors:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.errors, 1)
+        time.sleep(0.2)
+        with self.assertRaises(ConnectionError):
+            cache.get("k", fail)
+
+    def test_invalid_values_are_not_cached(self):
+        cache = StaleWhileRevalidate(ttl=0, valid=lambda value: value != "error")
+        cache.set("k", "good")
+        self.assertEqual(cache.get("k", lambda: "error", fresh=True), "error")
+        self.assertEqual(cache.get("k", lambda: "error"), "good")
+        for _ in range(100):
+            if cache.errors:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.errors, 1)
+        self.assertEqual(cache.get("k", lambda: "error"), "good")
+
+
+class TestClientCache(unittest.TestCase):
+    def test_credit_limit_counts_uploads(self):
+        account = Account()
+        client = Docsumo(apikey="test", transport=MockTransport(account), cache_ttl=60)
+        self.assertEqual(client.credits_remaining(), 10)
+        client.documents_summary()
+        client.documents_summary()
+        self.assertEqual(len(client.transport.requests), 2)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.pdf")
+            with open(path, "wb") as f:
+                f.write(b"%PDF-1.4")
+            client.upload_file(path, "Invoice")
+            client.upload_files([path, path], "invoice")
+
+        detail = client.user_detail_credit_limit()["data"]
+        self.assertEqual(detail["monthly_doc_current"], 13)
+        self.assertEqual(client.credits_remaining(), 7)
+        self.assertEqual(account.limit_calls, 1)
+
+        account.current += 1  # uploaded from elsewhere
+        self.assertEqual(client.credits_remaining(fresh=True), 6)
+        self.assertEqual(client.credits_remaining(), 6)
+        self.assertEqual(account.limit_calls, 2)
+
+    def test_failed_refresh_keeps_credit_limit(self):
+        account = Account()
+        failing = threading.Event()
+
+        def handler(request):
+            if failing.is_set():
+                return 500, {"status": "fail", "message": "server error"}
+            return account(request)
+
+        client = Docsumo(apikey="test", transport=MockTransport(handler), cache_ttl=60)
+        self.assertEqual(client.credits_remaining(), 10)
+        failing.set()
+        client.cache.ttl = 0
+        self.assertEqual(client.credits_remaining(), 10)
+        for _ in range(100):
+            if client.cache.errors:
+                break
+            time.sleep(0.01)
+        self.assertEqual(client.cache.errors, 1)
+        self.assertEqual(client.credits_remaining(), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
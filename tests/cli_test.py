@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from docsumo import Docsumo, cli
+from docsumo.transport import MockTransport
+
+
+def paged_documents(request):
+    documents = [{"doc_id": str(i), "status": "processed"} for i in range(5)]
+    offset, limit = request.params["offset"], request.params["limit"]
+    body = {
+        "data": {
+            "documents": documents[offset : offset + limit],
+            "limit": limit,
+            "offset": offset,
+            "total": len(documents),
+        }
+    }
+    return body
+
+
+def api(request):
+    if request.url.endswith("/limit/"):
+        return {"data": {"document_types": [{"title": "Invoice", "value": "invoice"}]}}
+    if request.url.endswith("/upload/"):
+        if request.files["files"][0] == "dup.pdf":
+            return {"status": "fail", "message": "duplicate"}
+        return {"status": "success", "data": {}}
+    doc_id = request.url.rstrip("/").rsplit("/", 1)[-1]
+    if "/delete/" in request.url:
+        if doc_id == "gone":
+            return 401, {"status": "fail", "message": "invalid apikey"}
+        return {"status": "success"}
+    if doc_id == "gone":
+        return {"status": "fail", "message": "not processed"}
+    return {"status": "success", "data": {}}
+
+
+class TestCli(unittest.TestCase):
+    def test_expand_paths(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "sub"))
+            for name in ["a.pdf", "b.png", os.path.join("sub", "c.pdf")]:
+                open(os.path.join(tmp, name), "wb").close()
+
+            self.assertEqual(len(cli._expand_paths([tmp])), 3)
+            self.assertEqual(
+                cli._expand_paths([os.path.join(tmp, "*.pdf")]),
+                [os.path.join(tmp, "a.pdf")],
+            )
+
+    def test_client_pools_a_connection_per_worker(self):
+        argv = ["list", "--apikey", "test", "-w", "16"]
+        client = cli._client(cli.build_parser().parse_args(argv))
+        adapter = client.transport.session.get_adapter("https://")
+        self.assertEqual(adapter._pool_maxsize, 16)
+        client.close()
+
+        record = os.path.join(self.tmp.name, "traffic.jsonl")
+        client = cli._client(cli.build_parser().parse_args(argv + ["--record", record]))
+        adapter = client.transport.transport.session.get_adapter("https://")
+        self.assertEqual(adapter._pool_maxsize, 16)
+        client.close()
+
+    def test_list_writes_jsonl(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "out.jsonl")
+            client = Docsumo(apikey="test", transport=MockTransport(paged_documents))
+            with mock.patch.object(cli, "_client", return_value=client):
+                code = cli.main(
+                    ["list", "--apikey", "test", "--page-size", "2", "-q", "-o", output]
+                )
+            self.assertEqual(code, 0)
+            with open(output) as f:
+                doc_ids = [json.loads(line)["doc_id"] for line in f]
+            self.assertEqual(doc_ids, ["0", "1", "2", "3", "4"])
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def main(self, argv):
+        """Exit code and records of ``argv`` run against ``api``."""
+        output = os.path.join(self.tmp.name, "out.jsonl")
+        client = Docsumo(apikey="test", transport=MockTransport(api))
+        with mock.patch.object(cli, "_client", return_value=client):
+            code = cli.main(argv + ["-q", "-o", output])
+        with open(output) as f:
+            records = [json.loads(line) for line in f]
+        return code, sorted(records, key=lambda r: r.get("doc_id") or r["file"])
+
+    def test_upload(self):
+        for name in ["a.pdf", "dup.pdf"]:
+            with open(os.path.join(self.tmp.name, name), "wb") as f:
+                f.write(b"%PDF-1.4")
+        pattern = os.path.join(self.tmp.name, "*.pdf")
+
+        code, records = self.main(["upload", pattern, "-t", "Invoice"])
+        self.assertEqual(code, 1)
+        self.assertEqual(
+            [r["response"]["status"] for r in records], ["success", "fail"]
+        )
+
+        code, _ = self.main(["upload", records[0]["file"], "-t", "Invoice"])
+        self.assertEqual(code, 0)
+
+    def test_export(self):
+        code, records = self.main(["export", "a", "b"])
+        self.assertEqual(code, 0)
+        self.assertEqual([r["doc_id"] for r in records], ["a", "b"])
+
+        code, records = self.main(["export", "a", "gone"])
+        self.assertEqual(code, 1)
+        self.assertEqual(records[1]["response"]["message"], "not processed")
+
+    def test_purge(self):
+        code, records = self.main(["purge", "a", "gone"])
+        self.assertEqual(code, 1)
+        self.assertEqual(
+            [r["response"] for r in records],
+            [
+                {"status": "success", "status_code": 200},
+                {"status": "fail", "message": "invalid apikey", "status_code": 401},
+            ],
+        )
+        self.assertEqual(cli.main(["purge", "-q"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
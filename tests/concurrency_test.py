@@ -0,0 +1,153 @@
+import importlib
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from docsumo import Docsumo
+from docsumo.concurrency import AdaptiveLimiter
+from docsumo.transport import MockTransport
+
+# the module, shadowed by the class in the package namespace
+client_module = importlib.import_module("docsumo.Docsumo")
+
+
+class Server:
+    """Throttles requests beyond ``capacity`` in flight."""
+
+    def __init__(self, capacity, delay=0.01):
+        self.capacity = capacity
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            throttled = self.in_flight > self.capacity
+        try:
+            if throttled:
+                return 429, {"error": "Too many requests", "status_code": 429}
+            time.sleep(self.delay)
+            if request.files:
+                return {
+                    "status": "success",
+                    "data": {"title": request.files["files"][0]},
+                }
+            return {"status": "success"}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def test_aimd(self):
+        limiter = AdaptiveLimiter(initial=4, max_limit=8)
+        for _ in range(50):
+            limiter.update(0.1)
+        self.assertEqual(limiter.limit, 8)
+
+        limiter.update(None, failed=True)
+        self.assertEqual(limiter.limit, 4)
+        # the same round of congestion is only counted once
+        limiter.update(0.1, failed=True)
+        self.assertEqual(limiter.limit, 4)
+
+        limiter = AdaptiveLimiter(initial=8)
+        limiter.update(0.1)
+        limiter.update(0.5)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_slots(self):
+        limiter = AdaptiveLimiter(initial=2)
+        self.assertTrue(limiter.acquire())
+        self.assertTrue(limiter.acquire(blocking=False))
+        self.assertFalse(limiter.acquire(blocking=False))
+        limiter.release()
+        self.assertTrue(limiter.acquire(blocking=False))
+
+    def test_bulk_operations_adapt(self):
+        server = Server(capacity=3)
+        limiter = AdaptiveLimiter(initial=2, max_limit=16)
+        client = Docsumo(
+            apikey="test", transport=MockTransport(server), concurrency=limiter
+        )
+        doc_ids = ["doc{}".format(i) for i in range(80)]
+        with mock.patch.object(client_module, "throttle_backoff", 0.01):
+            result = client.delete_documents(doc_ids)
+
+        # throttled deletions were retried until they went through
+        self.assertEqual(result, {"deleted_doc": doc_ids, "not_deleted_doc": []})
+        self.assertGreater(server.peak, 1)
+        self.assertGreater(client.metrics.counter("delete_documents", "status:429"), 0)
+        self.assertGreater(client.metrics.counter("delete_documents", "retries"), 0)
+        self.assertLessEqual(limiter.limit, 8)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_failed_deletions_are_reported(self):
+        def handler(request):
+            if request.url.endswith("/gone/"):
+                return 404, {"status": "fail", "message": "files doesnt exist"}
+            if request.url.endswith("/busy/"):
+                return 503, b"unavailable"
+            return {"status": "success"}
+
+        client = Docsumo(apikey="test", transport=MockTransport(handler))
+        with mock.patch.object(client_module, "throttle_backoff", 0.001):
+            result = client.delete_documents(["a", "gone", "busy"])
+        self.assertEqual(result["deleted_doc"], ["a"])
+        self.assertEqual(
+            result["not_deleted_doc"],
+            [
+                {"doc_id": "gone", "err_message": "files doesnt exist"},
+                {"doc_id": "busy", "err_message": "HTTP 503"},
+            ],
+        )
+        # the first try and five retries
+        busy = [r for r in client.transport.requests if r.url.endswith("/busy/")]
+        self.assertEqual(len(busy), 6)
+
+    def test_failing_tasks_release_their_slot(self):
+        limiter = AdaptiveLimiter(initial=4)
+        client = Docsumo(
+            apikey="test", transport=MockTransport(Server(10)), concurrency=limiter
+        )
+
+        def tasks():
+            yield lambda: 1
+            raise FileNotFoundError("missing.pdf")
+
+        with self.assertRaises(FileNotFoundError):
+            list(client._bulk(tasks()))
+        self.assertEqual(limiter.in_flight, 0)
+
+        with self.assertRaises(ValueError):
+            Docsumo(apikey="test", instrumentation=False, concurrency=limiter)
+
+    def test_uploads_keep_their_order(self):
+        server = Server(capacity=100)
+        client = Docsumo(
+            apikey="test", transport=MockTransport(server), concurrency=True
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for i in range(12):
+                paths.append(os.path.join(tmp, "{}.pdf".format(i)))
+                with open(paths[-1], "wb") as f:
+                    f.write(b"%PDF-1.4")
+            results = list(client.upload_files_iter(paths, "invoice"))
+
+        self.assertEqual([r["file_path"] for r in results], paths)
+        self.assertEqual(
+            [r["response"]["data"]["title"] for r in results],
+            ["{}.pdf".format(i) for i in range(12)],
+        )
+        self.assertGreater(server.peak, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+import unittest
+
+from docsumo import Docsumo, Instrumentation
+from docsumo.error import DeadlineExceeded
+from docsumo.transport import Response, Transport
+
+
+class SlowTransport(Transport):
+    """Answers every request after ``delay(call_number)`` seconds."""
+
+    def __init__(self, delay=lambda call: 0):
+        self.delay = delay
+        self.timeouts = []
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def request(self, method, url, params=None, timeout=None, **kwargs):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+            self.timeouts.append(timeout)
+        time.sleep(self.delay(call))
+        offset = (params or {}).get("offset", 0)
+        body = {
+            "status": "success",
+            "data": {"call": call, "documents": [{"doc_id": offset}], "total": 100},
+        }
+        return Response(200, json.dumps(body).encode())
+
+
+class TestDeadlines(unittest.TestCase):
+    def test_timeouts(self):
+        transport = SlowTransport()
+        client = Docsumo(apikey="test", transport=transport)
+        client.documents_summary()
+        Docsumo(apikey="test", transport=transport, timeout=5).documents_summary()
+        client.extracted_data("a", timeout=1)
+        with client.deadline(0.5):
+            client.extracted_data("a", timeout=10)
+        self.assertEqual(transport.timeouts[:2], [120, 5])
+        self.assertLessEqual(transport.timeouts[2], 1)
+        self.assertLessEqual(transport.timeouts[3], 0.5)
+
+    def test_budget_spans_pagination(self):
+        client = Docsumo(apikey="test", transport=SlowTransport(lambda call: 0.05))
+        seen = []
+        with self.assertRaises(DeadlineExceeded):
+            for document in client.documents_iter(page_size=1, timeout=0.12):
+                seen.append(document["doc_id"])
+        self.assertIn(len(seen), (2, 3))
+
+    def test_budget_reaches_worker_threads(self):
+        transport = SlowTransport()
+        client = Docsumo(apikey="test", transport=transport)
+        with client.deadline(2):
+            rows = list(client.extracted_fields_iter(["a", "b", "c"], ["call"]))
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(timeout <= 2 for timeout in transport.timeouts))
+
+    def test_hedged_reads(self):
+        # the 21st request stalls, its duplicate does not
+        transport = SlowTransport(lambda call: 2 if call == 21 else 0)
+        client = Docsumo(apikey="test", transport=transport, hedge=0.9)
+        for _ in range(20):
+            client.extracted_data("a")
+        self.assertEqual(client.metrics.counter("extracted_data", "hedged"), 0)
+
+        start = time.monotonic()
+        response = client.extracted_data("a")
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(response["data"]["call"], 22)
+        self.assertEqual(client.metrics.counter("extracted_data", "hedged"), 1)
+        self.assertEqual(client.metrics.counter("extracted_data", "hedge_won"), 1)
+        client.close()
+
+        with self.assertRaises(ValueError):
+            Docsumo(
+                apikey="test",
+                hedge=0.95,
+                instrumentation=Instrumentation(metrics=False),
+            )
+        with self.assertRaises(ValueError):
+            Docsumo(apikey="test", hedge=0.95, instrumentation=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+from docsumo import Docsumo, Instrumentation
+from docsumo.transport import MockTransport
+
+
+class FakeSpan:
+    def __init__(self, name):
+        self.name = name
+        self.attributes = {}
+        self.ended = False
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self):
+        self.ended = True
+
+
+class FakeTracer:
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name):
+        span = FakeSpan(name)
+        self.spans.append(span)
+        return span
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_hooks_and_metrics(self):
+        inst = Instrumentation()
+        seen = []
+        inst.add_pre_hook(lambda info: seen.append(("pre", info.name)))
+        inst.add_post_hook(lambda info: seen.append(("post", info.outcome)))
+        tracer = FakeTracer()
+        inst.add_tracer(tracer)
+
+        transport = MockTransport(lambda request: {})
+        r = Docsumo(apikey="test", instrumentation=inst, transport=transport)
+        r.extracted_data("abc")
+        r._update_item("abc", 1, "19", [0, 0, 1, 1])
+
+        self.assertEqual(
+            seen,
+            [
+                ("pre", "extracted_data"),
+                ("post", "success"),
+                ("pre", "_update_item"),
+                ("post", "success"),
+            ],
+        )
+        self.assertEqual(r.metrics.counter("extracted_data", "calls"), 1)
+        self.assertEqual(r.metrics.counter("extracted_data", "status:200"), 1)
+        self.assertEqual(r.metrics.counter("extracted_data", "bytes_received"), 2)
+        self.assertGreater(r.metrics.counter("_update_item", "bytes_sent"), 0)
+
+        snapshot = r.metrics.snapshot()
+        self.assertEqual(snapshot["latency"]["extracted_data"]["count"], 1)
+        self.assertIn("wait", snapshot["phases"]["extracted_data"])
+
+        self.assertEqual(len(tracer.spans), 2)
+        self.assertTrue(all(span.ended for span in tracer.spans))
+        self.assertEqual(tracer.spans[0].attributes["http.status_code"], 200)
+
+    def test_exception_outcome(self):
+        def down(request):
+            raise ConnectionError("down")
+
+        transport = MockTransport(down)
+        r = Docsumo(apikey="test", instrumentation=True, transport=transport)
+        with self.assertRaises(ConnectionError):
+            r.documents_summary()
+        self.assertEqual(r.metrics.counter("documents_summary", "outcome:exception"), 1)
+
+    def test_disabled(self):
+        r = Docsumo(apikey="test", transport=MockTransport(lambda request: {}))
+        self.assertIsNone(r.metrics)
+        self.assertEqual(r.documents_summary(), {})
+
+    def test_histogram_percentile(self):
+        inst = Instrumentation()
+        histogram = inst.metrics._histogram(inst.metrics.latency, "x")
+        for value in [0.001] * 90 + [2.0] * 10:
+            histogram.observe(value)
+        self.assertEqual(histogram.percentile(0.5), 0.005)
+        self.assertEqual(histogram.percentile(0.95), 2.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
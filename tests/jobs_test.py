@@ -0,0 +1,136 @@
+import itertools
+import os
+import tempfile
+import threading
+import unittest
+
+from docsumo import Docsumo
+from docsumo.error import ProcessingTimeout, UploadFailed
+from docsumo.jobs import JobRunner, as_completed
+from docsumo.transport import MockTransport
+
+
+class FakeServer:
+    """Documents become processed after being listed ``polls`` times."""
+
+    def __init__(self, polls=1, stuck=()):
+        self.polls = polls
+        self.stuck = set(stuck)
+        self.seen = {}
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        if request.url.endswith("/limit/"):
+            return {
+                "data": {"document_types": [{"title": "Invoice", "value": "invoice"}]}
+            }
+        if request.url.endswith("/upload/"):
+            filename = request.files["files"][0]
+            if filename == "bad.pdf":
+                return 409, {"status": "fail", "error": "duplicate", "status_code": 409}
+            with self.lock:
+                doc_id = "{}-{}".format(filename, next(self.ids))
+                self.seen[doc_id] = 0
+            return {
+                "status": "success",
+                "data": {
+                    "doc_id": doc_id,
+                    "created_at": "Mon, 22 Apr 2019 11:56:53 GMT",
+                },
+            }
+        if "/documents/" in request.url:
+            assert request.params["created_date"] == ["gte:2019-04-21"]
+            documents = []
+            with self.lock:
+                for doc_id in self.seen:
+                    self.seen[doc_id] += 1
+                    done = (
+                        self.seen[doc_id] > self.polls
+                        and doc_id.split("-")[0] not in self.stuck
+                    )
+                    documents.append(
+                        {"doc_id": doc_id, "status": "processed" if done else "new"}
+                    )
+            return {"data": {"documents": documents, "total": len(documents)}}
+        doc_id = request.url.rstrip("/").rsplit("/", 1)[1]
+        return {"data": {"doc_id": doc_id}, "status": "success"}
+
+
+class TestJobs(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def paths(self, *names):
+        paths = []
+        for name in names:
+            paths.append(os.path.join(self.tmp.name, name))
+            with open(paths[-1], "wb") as f:
+                f.write(b"%PDF-1.4")
+        return paths
+
+    def client(self, server):
+        return Docsumo(apikey="test", transport=MockTransport(server))
+
+    def test_jobs_resolve_to_extracted_data(self):
+        client = self.client(FakeServer(polls=1))
+        with JobRunner(client, poll_interval=0.01) as runner:
+            jobs = runner.map(self.paths("a.pdf", "b.pdf", "c.pdf"), "Invoice")
+            finished = list(as_completed(jobs, timeout=5))
+
+        self.assertEqual(len(finished), 3)
+        for job in jobs:
+            self.assertEqual(job.stage, "done")
+            self.assertEqual(job.status, "processed")
+            self.assertEqual(job.result()["data"]["doc_id"], job.doc_id)
+
+    def test_failures(self):
+        client = self.client(FakeServer(polls=0, stuck=["slow.pdf"]))
+        with JobRunner(client, poll_interval=0.01, timeout=0.1) as runner:
+            bad_path, slow_path = self.paths("bad.pdf", "slow.pdf")
+            bad = runner.submit(bad_path, "Invoice")
+            slow = runner.submit(slow_path, "Invoice")
+            with self.assertRaises(UploadFailed):
+                bad.result(timeout=5)
+            with self.assertRaises(ProcessingTimeout):
+                slow.result(timeout=5)
+        self.assertEqual(slow.stage, "failed")
+
+    def test_processed_after_deadline(self):
+        client = self.client(FakeServer(polls=0))
+        # the first poll happens after the deadline and finds it processed
+        with JobRunner(client, poll_interval=0.2, timeout=0.05) as runner:
+            job = runner.submit(self.paths("a.pdf")[0], "Invoice")
+            self.assertEqual(job.result(timeout=5)["data"]["doc_id"], job.doc_id)
+        self.assertEqual(job.status, "processed")
+
+    def test_failing_polls(self):
+        server = FakeServer(polls=0)
+
+        def handler(request):
+            if "/documents/" in request.url:
+                return 401, {"status": "fail", "message": "invalid apikey"}
+            return server(request)
+
+        client = Docsumo(apikey="test", transport=MockTransport(handler))
+        runner = JobRunner(
+            client, poll_interval=0.01, timeout=0.1, max_poll_errors=None
+        )
+        job = runner.submit(self.paths("a.pdf")[0], "Invoice")
+        with self.assertRaises(ProcessingTimeout):
+            job.result(timeout=5)
+        self.assertGreater(runner.poll_errors, 0)
+        self.assertIsNotNone(runner.last_poll_error)
+
+        runner = JobRunner(client, poll_interval=0.01, max_poll_errors=3)
+        job = runner.submit(self.paths("b.pdf")[0], "Invoice")
+        with self.assertRaises(Exception) as raised:
+            job.result(timeout=5)
+        self.assertIs(raised.exception, runner.last_poll_error)
+        self.assertEqual(runner.poll_errors, 3)
+        runner.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
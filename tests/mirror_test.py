@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+
+from docsumo import Docsumo
+from docsumo.mirror import DocumentMirror
+from docsumo.transport import MockTransport
+
+
+class Catalogue:
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = []
+
+    def __call__(self, request):
+        params = request.params
+        self.queries.append(params.get("created_date", []))
+        documents = self.documents
+        for date in params.get("created_date", []):
+            documents = [d for d in documents if d["created_date"][:10] >= date[4:]]
+        offset, limit = params["offset"], params["limit"]
+        return {
+            "data": {
+                "documents": documents[offset : offset + limit],
+                "total": len(documents),
+            }
+        }
+
+
+def document(doc_id, status, created_date, type="invoice", user_doc_id=None):
+    return {
+        "doc_id": doc_id,
+        "title": doc_id + ".pdf",
+        "type": type,
+        "status": status,
+        "created_date": created_date,
+        "user_doc_id": user_doc_id,
+    }
+
+
+class TestMirror(unittest.TestCase):
+    def setUp(self):
+        self.catalogue = Catalogue(
+            [
+                document("d", "new", "2021-03-10T09:00:00", user_doc_id="u-d"),
+                document("c", "processed", "2021-03-05T12:00:00", type="receipt"),
+                document("b", "reviewing", "2021-02-20T08:00:00"),
+                document("a", "processed", "2021-01-01T10:00:00"),
+            ]
+        )
+        self.client = Docsumo(apikey="test", transport=MockTransport(self.catalogue))
+
+    def test_queries_are_answered_locally(self):
+        mirror = DocumentMirror(self.client, max_age=None, page_size=3)
+        self.assertEqual(mirror.count(), 4)
+        self.assertEqual(len(self.catalogue.queries), 2)
+
+        self.assertEqual(mirror.count(status=["new", "reviewing"]), 2)
+        self.assertEqual(mirror.count(type="receipt"), 1)
+        self.assertEqual(mirror.count(created_date_less_than="2021-03-05"), 3)
+        self.assertEqual(
+            mirror.documents_list(user_doc_id="u-d")["data"]["documents"][0]["doc_id"],
+            "d",
+        )
+        page = mirror.documents_list(offset=1, limit=2)["data"]
+        self.assertEqual([d["doc_id"] for d in page["documents"]], ["c", "b"])
+        self.assertEqual(page["total"], 4)
+        self.assertEqual(
+            mirror.documents_summary()["data"],
+            {"new": 1, "processed": 2, "reviewing": 1},
+        )
+        self.assertEqual(len(self.catalogue.queries), 2)
+
+    def test_incremental_and_full_refresh(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "mirror.db")
+            mirror = DocumentMirror(self.client, path=path, max_age=None)
+            mirror.refresh(full=True)
+            mirror.close()
+
+            self.catalogue.documents[1]["status"] = "processed"
+            self.catalogue.documents[2]["status"] = "processed"
+            self.catalogue.documents.insert(
+                0, document("e", "new", "2021-03-11T09:00:00")
+            )
+            del self.catalogue.documents[-1]
+
+            # a reopened mirror picks up where it stopped, from the oldest
+            # pending document
+            mirror = DocumentMirror(self.client, path=path, max_age=0)
+            self.assertEqual(mirror.count(status="processed"), 3)
+            self.assertEqual(self.catalogue.queries[-1], ["gte:2021-02-19"])
+            self.assertEqual(mirror.count(), 5)
+
+            mirror.refresh(full=True)
+            self.assertEqual(mirror.count(), 4)
+            mirror.close()
+
+    def test_full_refresh_interval(self):
+        mirror = DocumentMirror(self.client, max_age=0, full_max_age=3600)
+        self.assertEqual(mirror.count(status="processed"), 2)
+        first = mirror.full_refreshed_at
+
+        # an old document changes and another is deleted
+        self.catalogue.documents[-1]["status"] = "review_required"
+        del self.catalogue.documents[1]
+        self.assertEqual(mirror.count(status="processed"), 2)
+        self.assertEqual(mirror.full_refreshed_at, first)
+
+        mirror.full_max_age = 0
+        self.assertEqual(mirror.count(status="processed"), 0)
+        self.assertEqual(mirror.count(), 3)
+        self.assertGreater(mirror.full_refreshed_at, first)
+        mirror.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+
+from docsumo.normalize import Parser, line_items, normalize
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipUnless(numpy, "numpy is not installed")
+class TestNormalize(unittest.TestCase):
+    def test_amounts(self):
+        column = Parser("amount").parse(
+            ["284", "$1,234.50", "(12.5)", "-3", None, " ", "N/A", {"value": "€ 7"}]
+        )
+        numpy.testing.assert_array_equal(
+            column.values[column.valid], [284, 1234.5, -12.5, -3, 7]
+        )
+        self.assertEqual(column.null.tolist(), [0, 0, 0, 0, 1, 1, 0, 0])
+        self.assertEqual(column.errors, [(6, "N/A")])
+
+        european = Parser("amount", decimal=",", thousands=".")
+        self.assertEqual(european.parse(["1.234,56"]).values.tolist(), [1234.56])
+
+        column = Parser("amount").parse(
+            ["2018-05-15", "1-2", "12 34", "--5", "(1)2", "12-", " + 3 "]
+        )
+        self.assertEqual([i for i, _ in column.errors], [0, 1, 2, 3, 4])
+        self.assertEqual(column.values[5:].tolist(), [-12, 3])
+
+    def test_decimals_and_ints(self):
+        column = Parser("decimal", scale=2).parse(["1,234.5", "0.01", "-7", "0.125"])
+        self.assertEqual(column.values.dtype, numpy.int64)
+        self.assertEqual(column.values[:3].tolist(), [123450, 1, -700])
+        self.assertEqual(column.errors, [(3, "0.125")])
+
+        column = Parser("decimal", scale=2).parse(
+            ["999999999999999999", "9999999999999999"]
+        )
+        self.assertEqual(column.errors, [(0, "999999999999999999")])
+        self.assertEqual(column.values[1], 999999999999999900)
+
+        column = Parser("int").parse(["284.00", "1,000", "2.5", "1.2.3"])
+        self.assertEqual(column.values[:2].tolist(), [284, 1000])
+        self.assertEqual([i for i, _ in column.errors], [2, 3])
+
+    def test_dates(self):
+        column = Parser("date").parse(
+            ["5/15/2018", "2018-05-16", "12/31/99", "2/29/2020", "2/30/2019", "May 5"]
+        )
+        self.assertEqual(column.values.dtype, numpy.dtype("datetime64[D]"))
+        self.assertEqual(
+            column.values[:4].astype(str).tolist(),
+            ["2018-05-15", "2018-05-16", "1999-12-31", "2020-02-29"],
+        )
+        self.assertTrue(numpy.isnat(column.values[4:]).all())
+        self.assertEqual([i for i, _ in column.errors], [4, 5])
+
+        column = Parser("date", order="DMY").parse(["15.05.2018"])
+        self.assertEqual(str(column.values[0]), "2018-05-15")
+
+    def test_rows_and_line_items(self):
+        rows = [
+            {"invoice.total": "284", "transactions[*].amount": ["120", "164"]},
+            {"invoice.total": None, "transactions[*].amount": None},
+            {"invoice.total": "1,000.5", "transactions[*].amount": ["x"]},
+        ]
+        columns = normalize(
+            rows, {"invoice.total": "amount", "transactions[*].amount": "decimal"}
+        )
+        self.assertEqual(columns["invoice.total"].null.tolist(), [False, True, False])
+        amounts = columns["transactions[*].amount"]
+        self.assertEqual(amounts.index.tolist(), [0, 0, 1, 2])
+        self.assertEqual(amounts.values[:2].tolist(), [12000, 16400])
+        self.assertEqual(amounts.errors, [(3, "x")])
+
+        responses = [
+            {"data": {"transactions": [{"amount": {"value": "1"}}]}},
+            {"data": {"transactions": []}},
+            {"data": {"transactions": [{"amount": {"value": "2"}}, {"amount": ""}]}},
+        ]
+        columns = line_items(responses, "transactions", {"amount": "amount"})
+        self.assertEqual(columns["amount"].index.tolist(), [0, 2, 2])
+        self.assertEqual(columns["amount"].values[:2].tolist(), [1.0, 2.0])
+        self.assertEqual(columns["amount"].null.tolist(), [False, False, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import threading
+import time
+import unittest
+
+from docsumo.pool import ClientPool, RateLimiter
+from docsumo.transport import MockTransport
+
+
+def handler(request):
+    return {"status": "success", "data": {"apikey": request.headers["apikey"]}}
+
+
+class TestClientPool(unittest.TestCase):
+    def test_handles_share_the_transport(self):
+        transport = MockTransport(handler)
+        with ClientPool(transport=transport, workers=4) as pool:
+            a = pool.client("key-a")
+            self.assertIs(pool.client("key-a"), a)
+            self.assertIs(pool.client("key-b").transport.transport, transport)
+
+            futures = pool.map("key-a", lambda c, _: c.documents_summary(), range(3))
+            futures.append(pool.submit("key-b", lambda c: c.documents_summary()))
+            results = [f.result(timeout=5)["data"]["apikey"] for f in futures]
+            self.assertEqual(results, ["key-a"] * 3 + ["key-b"])
+
+        self.assertEqual(len(transport.requests), 4)
+        stats = pool.stats()
+        self.assertEqual(stats["key-a"]["completed"], 3)
+        self.assertEqual(
+            stats["key-b"]["metrics"]["counters"]["documents_summary"]["calls"], 1
+        )
+
+    def test_keys_take_turns(self):
+        gate = threading.Event()
+        order = []
+
+        def task(client, name):
+            gate.wait(5)
+            order.append(name)
+
+        with ClientPool(transport=MockTransport(handler), workers=1) as pool:
+            for i in range(5):
+                pool.submit("big", task, "big{}".format(i))
+            pool.submit("small", task, "small0")
+            pool.submit("small", task, "small1")
+            self.assertEqual(pool.stats("big")["pending"], 4)
+            gate.set()
+
+        self.assertEqual(
+            order, ["big0", "big1", "small0", "big2", "small1", "big3", "big4"]
+        )
+
+    def test_rate_limit(self):
+        limiter = RateLimiter(rate=50, burst=2)
+        start = time.monotonic()
+        for _ in range(7):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+        with ClientPool(transport=MockTransport(handler), rate=50, burst=1) as pool:
+            client = pool.client("key")
+            start = time.monotonic()
+            for _ in range(4):
+                client.documents_summary()
+            self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_rate_limited_key_does_not_hold_workers(self):
+        pool = ClientPool(transport=MockTransport(handler), workers=2)
+        pool.client("slow", rate=2, burst=1)
+        for _ in range(20):
+            pool.submit("slow", lambda c: c.documents_summary())
+        start = time.monotonic()
+        fast = [pool.submit("fast", lambda c: c.documents_summary()) for _ in range(20)]
+        for future in fast:
+            future.result(timeout=5)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertGreater(pool.stats("slow")["pending"], 15)
+        pool.shutdown(wait=False)
+
+    def test_rate_of_existing_key_changes(self):
+        with ClientPool(transport=MockTransport(handler)) as pool:
+            client = pool.client("key")
+            pool.client("key", rate=50, burst=1)
+            start = time.monotonic()
+            for _ in range(4):
+                client.documents_summary()
+            self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import importlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from docsumo import Docsumo
+from docsumo.error import CreditLimitExceeded, PreflightError, UnsupportedDocumentType
+from docsumo.preflight import CreditTracker, check_file
+from docsumo.transport import MockTransport
+
+client_module = importlib.import_module("docsumo.Docsumo")
+
+pdf = b"%PDF-1.4\n1 0 obj\n<<>>\nendobj\ntrailer\n<<>>\n%%EOF\n"
+png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 20 + b"IEND\xaeB`\x82"
+
+
+def limit_handler(current, limit):
+    def handler(request):
+        if request.url.endswith("/limit/"):
+            return {
+                "data": {
+                    "monthly_doc_current": current,
+                    "monthly_doc_limit": limit,
+                    "document_types": [{"title": "Invoice", "value": "invoice"}],
+                }
+            }
+        return {"status": "success", "data": {"doc_id": "1"}}
+
+    return handler
+
+
+class TestPreflight(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_check_file(self):
+        self.assertEqual(check_file(self.write("a.pdf", pdf)), "pdf")
+        self.assertEqual(check_file(self.write("a.png", png)), "png")
+
+        for name, content in [
+            ("a.docx", b"PK"),
+            ("empty.pdf", b""),
+            ("fake.pdf", png),
+            ("cut.pdf", pdf[:20]),
+            ("cut.png", png[:-4]),
+        ]:
+            with self.assertRaises(PreflightError):
+                check_file(self.write(name, content))
+
+    def test_credit_tracker(self):
+        credits = CreditTracker(limit=2, used=1)
+        credits.reserve()
+        self.assertEqual(credits.remaining, 0)
+        with self.assertRaises(CreditLimitExceeded):
+            credits.reserve()
+        credits.release()
+        self.assertEqual(credits.remaining, 1)
+
+        credits.reserve()
+        self.assertFalse(credits.due(60))
+        self.assertTrue(credits.due(0))
+        credits.update({"monthly_doc_limit": 5, "monthly_doc_current": 0})
+        self.assertEqual((credits.used, credits.remaining), (1, 4))
+        credits.settle()
+        credits.update({"monthly_doc_limit": 5, "monthly_doc_current": 1})
+        self.assertEqual(credits.remaining, 4)
+
+    def test_upload_file_rejected_locally(self):
+        transport = MockTransport(limit_handler(0, 10))
+        r = Docsumo(apikey="test", transport=transport, preflight=True)
+        with self.assertRaises(PreflightError):
+            r.upload_file(self.write("fake.pdf", png), "Invoice")
+        with self.assertRaises(UnsupportedDocumentType):
+            r.upload_file(self.write("a.pdf", pdf), "Receipt")
+        self.assertFalse([req for req in transport.requests if req.files])
+
+        r.upload_file(self.write("a.pdf", pdf), "Invoice")
+        self.assertEqual(r.credits.remaining, 9)
+
+    def test_upload_files_stops_at_quota(self):
+        transport = MockTransport(limit_handler(8, 10))
+        r = Docsumo(apikey="test", transport=transport, preflight=True)
+        paths = [self.write("{}.pdf".format(i), pdf) for i in range(3)]
+        paths.insert(1, self.write("bad.png", b"junk"))
+
+        res = r.upload_files(paths, "Invoice")
+        self.assertEqual(len(res["files_uploaded"]), 2)
+        errors = [e["error"] for e in res["files_not_uploaded"]]
+        self.assertEqual(len(errors), 2)
+        self.assertIn("content is unknown", errors[0])
+        self.assertIn("limit", errors[1])
+        self.assertEqual(len([req for req in transport.requests if req.files]), 2)
+
+    def test_upload_files_rejects_missing_path(self):
+        transport = MockTransport(limit_handler(0, 10))
+        r = Docsumo(apikey="test", transport=transport, preflight=True)
+        paths = [self.write("a.pdf", pdf), "/nonexistent/missing.pdf"]
+        paths.append(self.write("b.pdf", pdf))
+
+        res = r.upload_files(paths, "Invoice")
+        self.assertEqual(len(res["files_uploaded"]), 2)
+        self.assertIn("cannot be read", res["files_not_uploaded"][0]["error"])
+        self.assertEqual(r.credits.remaining, 8)
+
+    def test_used_up_credits_are_synced(self):
+        usage = {"current": 9}
+
+        def handler(request):
+            return limit_handler(usage["current"], 10)(request)
+
+        transport = MockTransport(handler)
+        r = Docsumo(apikey="test", transport=transport, preflight=True)
+        r.upload_file(self.write("a.pdf", pdf), "Invoice")
+        with self.assertRaises(CreditLimitExceeded):
+            r.upload_file(self.write("b.pdf", pdf), "Invoice")
+
+        # the monthly reset
+        usage["current"] = 0
+        with mock.patch.object(client_module, "credits_sync", 0):
+            r.upload_file(self.write("b.pdf", pdf), "Invoice")
+        self.assertEqual(r.credits.remaining, 9)
+
+        usage["current"] = 10
+        r = Docsumo(apikey="test", transport=transport, preflight=True)
+        paths = [self.write("c.pdf", pdf)]
+        res = r.upload_files(paths, "Invoice")
+        self.assertIn("limit", res["files_not_uploaded"][0]["error"])
+        usage["current"] = 3
+        with mock.patch.object(client_module, "credits_sync", 0):
+            res = r.upload_files(paths, "Invoice")
+        self.assertEqual(len(res["files_uploaded"]), 1)
+        self.assertEqual(r.credits.remaining, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import tempfile
+import unittest
+
+from docsumo import Docsumo
+from docsumo.preprocess import Optimizer, optimize_file
+from docsumo.transport import MockTransport
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+limit_response = {
+    "data": {"document_types": [{"title": "Invoice", "value": "invoice"}]},
+}
+
+
+@unittest.skipUnless(Image, "pillow is not installed")
+class TestPreprocess(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "scan.png")
+        image = Image.new("RGB", (1200, 1200), "white")
+        for x in range(0, 1200, 7):
+            for y in range(0, 1200, 50):
+                image.putpixel((x, y), (x % 256, y % 256, 0))
+        image.save(self.path, dpi=(600, 600))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_downscale(self):
+        optimized = optimize_file(self.path, target_dpi=150)
+        self.assertEqual(optimized.filename, "scan.png")
+        self.assertGreater(optimized.bytes_saved, 0)
+        with Image.open(self.path) as original:
+            self.assertEqual(original.size, (1200, 1200))
+
+    def test_lossy_changes_extension(self):
+        optimized = optimize_file(self.path, target_dpi=150, lossless=False)
+        self.assertEqual(optimized.filename, "scan.jpg")
+
+    def test_not_smaller_keeps_original(self):
+        path = os.path.join(self.tmp.name, "notes.txt")
+        with open(path, "wb") as f:
+            f.write(b"text")
+        optimized = optimize_file(path)
+        self.assertEqual(optimized.content, b"text")
+        self.assertEqual(optimized.bytes_saved, 0)
+
+    def test_lossless_keeps_jpeg(self):
+        path = os.path.join(self.tmp.name, "scan.jpg")
+        with Image.open(self.path) as image:
+            image.save(path, dpi=(600, 600), quality=95)
+        optimized = optimize_file(path, target_dpi=150)
+        with open(path, "rb") as f:
+            self.assertEqual(optimized.content, f.read())
+
+    def test_undecodable_keeps_original(self):
+        path = os.path.join(self.tmp.name, "broken.png")
+        with open(path, "wb") as f:
+            f.write(b"junk" * 100)
+        optimized = optimize_file(path)
+        self.assertEqual(optimized.bytes_saved, 0)
+        self.assertIn("UnidentifiedImageError", optimized.error)
+
+    @unittest.skipUnless(pypdf, "pypdf is not installed")
+    def test_batch_uploads_undecodable_files(self):
+        def handler(request):
+            if request.url.endswith("/limit/"):
+                data = {"monthly_doc_limit": 10, "monthly_doc_current": 0}
+                return {"data": dict(limit_response["data"], **data)}
+            return {"status": "success", "data": {"doc_id": "1"}}
+
+        broken = os.path.join(self.tmp.name, "broken.pdf")
+        with open(broken, "wb") as f:
+            f.write(b"%PDF-1.4\ngarbage\n%%EOF\n")
+        optimizer = Optimizer(target_dpi=150, processes=0)
+        r = Docsumo(
+            apikey="test",
+            transport=MockTransport(handler),
+            optimizer=optimizer,
+            preflight=True,
+        )
+        res = r.upload_files([broken, self.path], "Invoice")
+        self.assertEqual(len(res["files_uploaded"]), 2)
+        self.assertEqual(r.credits.remaining, 8)
+        self.assertIn("error", optimizer.report[0])
+
+    def test_upload_uses_optimized_bytes(self):
+        def handler(request):
+            if request.url.endswith("/limit/"):
+                return limit_response
+            return {"status": "success", "data": {"doc_id": "1"}}
+
+        transport = MockTransport(handler)
+        optimizer = Optimizer(target_dpi=150, processes=1)
+        r = Docsumo(apikey="test", transport=transport, optimizer=optimizer)
+        r.upload_files([self.path], "Invoice")
+        r.upload_file(self.path, "Invoice")
+        optimizer.close()
+
+        uploads = [req for req in transport.requests if req.files]
+        self.assertEqual(len(uploads), 2)
+        filename, content = uploads[0].files["files"]
+        self.assertEqual(filename, "scan.png")
+        self.assertLess(len(content), os.path.getsize(self.path))
+        self.assertEqual(len(optimizer.report), 2)
+        self.assertGreater(optimizer.bytes_saved, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
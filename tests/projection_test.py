@@ -0,0 +1,86 @@
+import unittest
+
+from docsumo import Docsumo
+from docsumo.projection import FieldPath, Projection
+from docsumo.transport import MockTransport
+
+
+def extracted(number):
+    return {
+        "data": {
+            "invoice": {
+                "number": {"value": number, "position": [1920, 424, 2087, 448]},
+                "date": {"value": "5/15/2018", "position": [1993, 474, 2086, 495]},
+            },
+            "transactions": [
+                {"amount": {"value": "120", "position": [1, 2, 3, 4]}},
+                {"amount": {"value": "164", "position": ""}},
+            ],
+        },
+        "status": "success",
+        "status_code": 200,
+    }
+
+
+def handler(request):
+    doc_id = request.url.rstrip("/").rsplit("/", 1)[1]
+    if doc_id == "gone":
+        return 404, {"error": "Document not found", "status_code": 404}
+    return extracted(doc_id)
+
+
+class TestProjection(unittest.TestCase):
+    def test_paths(self):
+        data = extracted("19")["data"]
+        self.assertEqual(FieldPath("invoice.number").extract(data), "19")
+        self.assertEqual(
+            FieldPath("transactions[*].amount").extract(data), ["120", "164"]
+        )
+        self.assertEqual(FieldPath("transactions[-1].amount").extract(data), "164")
+        self.assertEqual(
+            FieldPath("invoice.date").extract(data, position=True),
+            ("5/15/2018", [1993, 474, 2086, 495]),
+        )
+        self.assertIsNone(FieldPath("invoice.missing.value").extract(data))
+        self.assertIsNone(FieldPath("invoice[*]").extract(data))
+        for path in ["", "invoice..number", "invoice[x]", "a[0]b"]:
+            with self.assertRaises(ValueError):
+                FieldPath(path)
+
+    def test_rows_with_positions(self):
+        projection = Projection(["invoice.number", "transactions[*].amount"], True)
+        self.assertEqual(
+            projection.row(extracted("19")),
+            {
+                "invoice.number": "19",
+                "invoice.number.position": [1920, 424, 2087, 448],
+                "transactions[*].amount": ["120", "164"],
+                "transactions[*].amount.position": [[1, 2, 3, 4], ""],
+            },
+        )
+        self.assertEqual(len(projection.columns), 4)
+
+    def test_extracted_fields_iter(self):
+        client = Docsumo(apikey="test", transport=MockTransport(handler))
+        doc_ids = ["d{}".format(i) for i in range(40)] + ["gone"]
+        rows = list(
+            client.extracted_fields_iter(
+                iter(doc_ids), ["invoice.number", "transactions[*].amount"], workers=4
+            )
+        )
+        self.assertEqual([row["doc_id"] for row in rows], doc_ids)
+        self.assertEqual(rows[3]["invoice.number"], "d3")
+        self.assertEqual(rows[3]["transactions[*].amount"], ["120", "164"])
+        self.assertEqual(
+            rows[-1],
+            {
+                "doc_id": "gone",
+                "invoice.number": None,
+                "transactions[*].amount": None,
+                "error": "Document not found",
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
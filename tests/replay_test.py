@@ -0,0 +1,131 @@
+import io
+import json
+import os
+import pathlib
+import tempfile
+import unittest
+
+from docsumo import Docsumo, cli
+from docsumo.replay import StandInServer, load, replay
+from docsumo.transport import MockTransport, RecordingTransport, endpoint
+
+
+def api(request):
+    if "/data/" in request.url:
+        return {"status": "success", "data": {"invoice": {"total": "284"}}}
+    if "/delete/" in request.url:
+        return 404, {"status": "error", "message": "Not found"}
+    return {"status": "success", "data": {"documents": []}}
+
+
+class TestRecordingTransport(unittest.TestCase):
+    def test_records_sizes_not_content(self):
+        stream = io.StringIO()
+        transport = RecordingTransport(MockTransport(api), stream)
+        client = Docsumo(
+            apikey="test", url="https://app.docsumo.com/", transport=transport
+        )
+        client.extracted_data("5f1a2b3c4d5e6f7a8b9c0d1e")
+        client.documents_list(limit=5)
+        client.delete_documents(["5f1a2b3c4d5e6f7a8b9c0d1f"])
+
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(
+            [(r["method"], r["endpoint"], r["status"]) for r in records],
+            [
+                ("GET", "/api/v1/eevee/apikey/data/{id}/", 200),
+                ("GET", "/api/v1/eevee/apikey/documents/", 200),
+                ("POST", "/api/v1/eevee/apikey/delete/{id}/", 404),
+            ],
+        )
+        body = json.dumps(api(transport.transport.requests[0])).encode()
+        self.assertEqual(records[0]["response_bytes"], len(body))
+        self.assertNotIn("5f1a2b3c", stream.getvalue())
+        self.assertLessEqual(records[0]["start"], records[1]["start"])
+
+    def test_records_errors(self):
+        def fail(request):
+            raise ConnectionError()
+
+        stream = io.StringIO()
+        transport = RecordingTransport(MockTransport(fail), stream)
+        with self.assertRaises(ConnectionError):
+            transport.request("POST", "https://x/api/v1/upload/", data=b"abc")
+        record = json.loads(stream.getvalue())
+        self.assertEqual(record["error"], "ConnectionError")
+        self.assertIsNone(record["status"])
+        self.assertEqual(record["request_bytes"], 3)
+
+    def test_records_to_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / "traffic.jsonl"
+            transport = RecordingTransport(MockTransport(api), path)
+            transport.request("GET", "https://x/api/v1/eevee/apikey/data/ab12/")
+            transport.close()
+            self.assertEqual(len(load(path)), 1)
+
+            code = cli.main(
+                ["upload", tmp, "-t", "invoice", "-p", "2", "--record", str(path)]
+            )
+            self.assertEqual(code, 2)
+
+    def test_endpoint(self):
+        self.assertEqual(
+            endpoint("https://x//api/v1/eevee/apikey/update/item/ab12/3/?a=1"),
+            "/api/v1/eevee/apikey/update/item/{id}/{id}/",
+        )
+
+
+class TestReplay(unittest.TestCase):
+    records = [
+        {
+            "start": i * 0.01,
+            "method": method,
+            "endpoint": path,
+            "request_bytes": request_bytes,
+            "status": status,
+            "response_bytes": 100,
+            "elapsed": 0.02,
+        }
+        for i, (method, path, request_bytes, status) in enumerate(
+            [
+                ("GET", "/api/v1/eevee/apikey/data/{id}/", 0, 200),
+                ("POST", "/api/v1/eevee/apikey/upload/", 5000, 200),
+                ("DELETE", "/api/v1/eevee/apikey/delete/{id}/", 0, 404),
+            ]
+            * 4
+        )
+    ]
+
+    def test_replay_against_stand_in(self):
+        with StandInServer(self.records) as server:
+            report = replay(self.records, server.url, speed=2, concurrency=4)
+            self.assertEqual(server.served, 12)
+
+        self.assertEqual(report.requests, 12)
+        self.assertEqual(report.errors, 0)
+        self.assertEqual(dict(report.statuses), {200: 8, 404: 4})
+        self.assertGreaterEqual(report.percentile(0.5), 0.02)
+        self.assertGreater(report.throughput, 0)
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            recording = os.path.join(tmp, "traffic.jsonl")
+            output = os.path.join(tmp, "report.json")
+            with open(recording, "w") as f:
+                for record in reversed(self.records):
+                    f.write(json.dumps(record) + "\n")
+            self.assertEqual(load(recording)[0]["start"], 0.0)
+
+            code = cli.main(
+                ["replay", recording, "--speed", "10", "--latency", "0", "-o", output]
+            )
+            self.assertEqual(code, 0)
+            with open(output) as f:
+                report = json.load(f)
+        self.assertEqual(report["requests"], 12)
+        self.assertEqual(report["statuses"], {"200": 8, "404": 4})
+
+
+if __name__ == "__main__":
+    unittest.main()
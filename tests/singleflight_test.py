@@ -0,0 +1,62 @@
+import threading
+import unittest
+
+from docsumo import Docsumo
+from docsumo.singleflight import SingleFlight
+from docsumo.transport import MockTransport
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_reads_share_one_request(self):
+        release = threading.Event()
+        arrived = threading.Semaphore(0)
+
+        def handler(request):
+            release.wait(5)
+            return {"status": "success", "data": {"url": request.url}}
+
+        client = Docsumo(
+            apikey="test",
+            transport=MockTransport(handler),
+            instrumentation=True,
+            coalesce=True,
+        )
+        results = []
+
+        def read(doc_id):
+            arrived.release()
+            results.append(client.extracted_data(doc_id))
+
+        threads = [
+            threading.Thread(target=read, args=(doc_id,))
+            for doc_id in ["a"] * 5 + ["b"] * 3
+        ]
+        for thread in threads:
+            thread.start()
+        for _ in threads:
+            arrived.acquire()
+        # leave the followers time to join the in-flight calls
+        while client.single_flight.merged < 6:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(client.transport.requests), 2)
+        self.assertEqual(len(results), 8)
+        self.assertEqual(client.metrics.counter("extracted_data", "coalesced"), 6)
+        self.assertEqual(client.metrics.counter("extracted_data", "calls"), 2)
+
+        # finished calls are not reused
+        client.extracted_data("a")
+        self.assertEqual(len(client.transport.requests), 3)
+
+    def test_failed_call_is_not_kept(self):
+        flight = SingleFlight()
+        with self.assertRaises(KeyError):
+            flight.do("k", lambda: {}["missing"])
+        self.assertEqual(flight.do("k", lambda: 1), (1, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from docsumo import Docsumo
+from docsumo.transport import (
+    HTTP2Transport,
+    MockTransport,
+    RequestsTransport,
+    Urllib3Transport,
+)
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        parsed = urlparse(self.path)
+        reply = json.dumps(
+            {
+                "method": self.command,
+                "path": parsed.path,
+                "query": parse_qs(parsed.query),
+                "content_type": self.headers.get("Content-Type"),
+                "body": body.decode("latin-1"),
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class TestTransports(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+        cls.url = "http://127.0.0.1:{}".format(cls.server.server_address[1])
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def check_transport(self, transport):
+        r = Docsumo(apikey="test", url=self.url, transport=transport)
+        with r:
+            res = r.documents_list(
+                created_date_greater_than="2020-01-01",
+                created_date_less_than="2020-02-01",
+            )
+            self.assertEqual(res["method"], "GET")
+            self.assertEqual(
+                res["query"]["created_date"], ["gte:2020-01-01", "lte:2020-02-01"]
+            )
+
+            res = r._update_item("abc", 1, "19", [0, 0, 1, 1])
+            self.assertEqual(json.loads(res["body"])["value"], "19")
+
+            _, res = r._request(
+                "upload",
+                "POST",
+                self.url + "/upload/",
+                headers=r.headers,
+                files={
+                    "files": ("a.pdf", b"%PDF-1.4 data"),
+                    "type": (None, "invoice"),
+                },
+            )
+            self.assertTrue(res["content_type"].startswith("multipart/form-data"))
+            self.assertIn("%PDF-1.4 data", res["body"])
+            self.assertIn('filename="a.pdf"', res["body"])
+
+    def test_requests_transport(self):
+        self.check_transport(RequestsTransport())
+
+    def test_urllib3_transport(self):
+        self.check_transport(Urllib3Transport())
+
+    def test_http2_transport(self):
+        try:
+            transport = HTTP2Transport()
+        except ImportError:
+            self.skipTest("httpx is not installed")
+        self.check_transport(transport)
+
+    def test_mock_transport(self):
+        transport = MockTransport(lambda request: (404, {"status_code": 404}))
+        r = Docsumo(apikey="test", transport=transport)
+        self.assertEqual(r.extracted_ocr("abc"), {"status_code": 404})
+        self.assertTrue(transport.requests[0].url.endswith("/ocr/abc/"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+from docsumo import Docsumo
+from docsumo.transport import MockTransport
+
+
+def handler(request):
+    filename = request.files["files"][0]
+    if filename == "dup.pdf":
+        return 409, {"error": "Duplicated user_id ", "message": "", "status_code": 409}
+    if filename == "down.pdf":
+        return 502, b"<html>bad gateway</html>"
+    if filename == "slow.pdf":
+        raise TimeoutError("read timed out")
+    if filename == "denied.pdf":
+        return 401, b"Unauthorized"
+    return {"status": "success", "data": {"title": filename}}
+
+
+class TestUploadFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.paths = []
+        for name in ["a.pdf", "dup.pdf", "down.pdf", "b.pdf"]:
+            self.paths.append(os.path.join(self.tmp.name, name))
+            with open(self.paths[-1], "wb") as f:
+                f.write(b"%PDF-1.4")
+        self.client = Docsumo(apikey="test", transport=MockTransport(handler))
+
+    def test_iter_yields_every_outcome_lazily(self):
+        results = self.client.upload_files_iter(iter(self.paths), "Invoice")
+        first = next(results)
+        self.assertEqual(len(self.client.transport.requests), 1)
+        self.assertEqual(first["file_path"], self.paths[0])
+        self.assertTrue(first["uploaded"])
+
+        rest = list(results)
+        self.assertEqual([r["uploaded"] for r in rest], [False, False, True])
+        self.assertEqual(rest[0]["response"]["status_code"], 409)
+        self.assertEqual(rest[1]["response"]["status_code"], 502)
+        self.assertEqual(rest[1]["response"]["metadata"]["title"], "down.pdf")
+
+    def test_upload_files_reports_every_file(self):
+        res = self.client.upload_files(self.paths, "Invoice", ["1", "2", "3", "4"])
+        self.assertEqual(len(res["files_uploaded"]), 2)
+        self.assertEqual(
+            [e["metadata"] for e in res["files_not_uploaded"]],
+            [
+                {"user_doc_id": "2", "title": "dup.pdf"},
+                {"user_doc_id": "3", "title": "down.pdf"},
+            ],
+        )
+        self.assertEqual(self.client.transport.requests[0].files["user_doc_id"][1], "1")
+
+    def test_failing_files_do_not_end_the_batch(self):
+        paths = [self.paths[0]]
+        for name in ["slow.pdf", "denied.pdf"]:
+            paths.append(os.path.join(self.tmp.name, name))
+            with open(paths[-1], "wb") as f:
+                f.write(b"%PDF-1.4")
+        paths.append(os.path.join(self.tmp.name, "missing.pdf"))
+        paths.append(self.paths[3])
+
+        results = list(self.client.upload_files_iter(paths, "Invoice"))
+        self.assertEqual(
+            [r["uploaded"] for r in results], [True, False, False, False, True]
+        )
+        self.assertIn("TimeoutError", results[1]["response"]["error"])
+        self.assertEqual(results[2]["response"]["status_code"], 401)
+        self.assertIn("FileNotFoundError", results[3]["response"]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
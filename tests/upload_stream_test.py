@@ -0,0 +1,136 @@
+import email.parser
+import email.policy
+import io
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from docsumo import Docsumo
+from docsumo.error import PreflightError
+from docsumo.transport import HTTP2Transport, RequestsTransport, Urllib3Transport
+
+limit_response = {
+    "data": {
+        "monthly_doc_current": 0,
+        "monthly_doc_limit": 10,
+        "document_types": [{"title": "Invoice", "value": "invoice"}],
+    }
+}
+
+
+class UploadHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _body(self):
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                chunk = self.rfile.read(size + 2)[:-2]
+                if not size:
+                    return body, True
+                body += chunk
+        return self.rfile.read(int(self.headers["Content-Length"])), False
+
+    def _reply(self, body):
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        self._reply(limit_response)
+
+    def do_POST(self):
+        body, chunked = self._body()
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b"Content-Type: "
+            + self.headers["Content-Type"].encode()
+            + b"\r\n\r\n"
+            + body
+        )
+        parts = {}
+        for part in message.iter_parts():
+            parts[part.get_param("name", header="content-disposition")] = (
+                part.get_filename(),
+                part.get_payload(decode=True),
+            )
+        self._reply(
+            {
+                "status": "success",
+                "chunked": chunked,
+                "filename": parts["files"][0],
+                "content": parts["files"][1].decode(),
+                "type": parts["type"][1].decode(),
+                "user_doc_id": parts.get("user_doc_id", (None, b""))[1].decode(),
+            }
+        )
+
+    def log_message(self, *args):
+        pass
+
+
+class NonSeekable(io.RawIOBase):
+    def __init__(self, content):
+        self.buffer = io.BytesIO(content)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self.buffer.readinto(b)
+
+
+class TestUploadStream(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), UploadHandler)
+        cls.url = "http://127.0.0.1:{}".format(cls.server.server_address[1])
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def check_transport(self, transport):
+        pdf = b"%PDF-1.4 " + b"x" * 200000 + b" %%EOF"
+        r = Docsumo(apikey="test", url=self.url, transport=transport, preflight=True)
+
+        res = r.upload_bytes(memoryview(pdf), "a.pdf", "Invoice", "u1")
+        self.assertEqual(res["filename"], "a.pdf")
+        self.assertEqual(res["content"].encode(), pdf)
+        self.assertEqual((res["type"], res["user_doc_id"]), ("invoice", "u1"))
+        self.assertFalse(res["chunked"])
+
+        res = r.upload_stream(io.BytesIO(pdf), "b.pdf", "Invoice")
+        self.assertEqual(res["content"].encode(), pdf)
+        self.assertFalse(res["chunked"])
+
+        res = r.upload_stream(NonSeekable(pdf), "c.pdf", "Invoice")
+        self.assertEqual(res["content"].encode(), pdf)
+        self.assertTrue(res["chunked"])
+        self.assertEqual(r.credits.remaining, 7)
+
+        with self.assertRaises(PreflightError):
+            r.upload_bytes(b"not a pdf", "d.pdf", "Invoice")
+
+    def test_requests_transport(self):
+        self.check_transport(RequestsTransport())
+
+    def test_urllib3_transport(self):
+        self.check_transport(Urllib3Transport())
+
+    def test_http2_transport(self):
+        try:
+            transport = HTTP2Transport()
+        except ImportError:
+            self.skipTest("httpx is not installed")
+        self.check_transport(transport)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from docsumo import Docsumo
+from docsumo.jobs import JobRunner
+from docsumo.transport import MockTransport
+from docsumo.webhook import WebhookReceiver
+
+
+def post(url, payload):
+    request = Request(url, data=json.dumps(payload).encode(), method="POST")
+    with urlopen(request, timeout=5) as response:
+        return response.status
+
+
+class TestWebhook(unittest.TestCase):
+    def test_resolves_waiters_and_callbacks(self):
+        seen = []
+        with WebhookReceiver(token="secret") as receiver:
+            receiver.on_complete(lambda doc_id, payload: seen.append(doc_id))
+            future = receiver.wait("abc")
+            self.assertEqual(post(receiver.url, {"data": {"doc_id": "abc"}}), 200)
+            self.assertEqual(future.result(timeout=5), {"data": {"doc_id": "abc"}})
+
+            # notifications arriving before the wait are kept
+            post(receiver.url, {"doc_id": "early", "status": "processed"})
+            self.assertEqual(
+                receiver.wait("early").result(timeout=5)["doc_id"], "early"
+            )
+
+            with self.assertRaises(HTTPError) as error:
+                post(receiver.url.split("?")[0], {"doc_id": "abc"})
+            self.assertEqual(error.exception.code, 403)
+
+        self.assertEqual(seen, ["abc", "early"])
+
+    def test_job_runner_uses_notifications(self):
+        uploaded = threading.Event()
+
+        def handler(request):
+            if request.url.endswith("/limit/"):
+                return {
+                    "data": {
+                        "document_types": [{"title": "Invoice", "value": "invoice"}]
+                    }
+                }
+            if request.url.endswith("/upload/"):
+                uploaded.set()
+                return {"status": "success", "data": {"doc_id": "abc"}}
+            return {"status": "success", "data": {"invoice": {}}}
+
+        with tempfile.TemporaryDirectory() as tmp, WebhookReceiver() as receiver:
+            path = os.path.join(tmp, "a.pdf")
+            with open(path, "wb") as f:
+                f.write(b"%PDF-1.4")
+
+            client = Docsumo(apikey="test", transport=MockTransport(handler))
+            # polling is effectively off, only the webhook can finish the job
+            with JobRunner(client, poll_interval=3600, receiver=receiver) as runner:
+                job = runner.submit(path, "Invoice")
+                uploaded.wait(5)
+                post(receiver.url, {"doc_id": "abc", "status": "processed"})
+                self.assertEqual(
+                    job.result(timeout=5),
+                    {"status": "success", "data": {"invoice": {}}},
+                )
+            self.assertEqual(job.status, "processed")
+
+
+if __name__ == "__main__":
+    unittest.main()